@@ -0,0 +1,429 @@
+"""asyncio version of CombinedClient for driving many vehicles from one process.
+
+AsyncCombinedClient has the same methods and return values as CombinedClient,
+but every call is awaited. Clients can share one httpx.AsyncClient and one
+asyncio.Semaphore, which caps the number of requests in flight across the
+whole fleet. Nonce signing runs in an executor so ECDSA work does not block
+the event loop.
+
+Usage:
+    python async_combined_client.py [concurrency]
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+import httpx
+from signing_service import sign_nonce
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 20
+DOWNLOAD_WRITE_BYTES = 1024 * 1024  # Buffered bytes per file write in download_file
+
+def sign_resource_nonce(nonce, private_key):
+    """Sign nonce with private key using solidity keccak hash"""
+    return sign_nonce(private_key, nonce)
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class PermitStream(httpx.AsyncByteStream):
+    """Response body that holds a concurrency permit until the response is closed"""
+    def __init__(self, stream, semaphore):
+        self.stream = stream
+        self.semaphore = semaphore
+        self.released = False
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if not self.released:
+                self.released = True
+                self.semaphore.release()
+
+def load_accounts(path='accounts.json'):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def default_client_secret(client_id):
+    """Secret seeded by authserver/init_db.py for a tesla_<model>_<n> vehicle"""
+    return f"tesla_secret_{client_id.rsplit('_', 1)[-1]}"
+
+class AsyncCombinedClient:
+    def __init__(self, client_id, client_secret, auth_server_url, resource_server_url,
+                 http_client=None, semaphore=None, executor=None, accounts=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.auth_server_url = auth_server_url.rstrip('/')
+        self.resource_server_url = resource_server_url.rstrip('/')
+        self.token = None
+
+        # Shared connection pool and fleet-wide concurrency limit
+        self._owns_http = http_client is None
+        self.http = http_client or httpx.AsyncClient(timeout=30)
+        self.semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+        self.executor = executor
+
+        accounts = accounts if accounts is not None else load_accounts()
+        self.private_key = accounts[self.client_id]['private_key']
+        self.address = accounts[self.client_id]['address']
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._owns_http:
+            await self.http.aclose()
+
+    async def _request(self, method, url, **kwargs):
+        async with self.semaphore:
+            return await self.http.request(method, url, **kwargs)
+
+    async def authorize(self, scope):
+        """First step: Get authorization code"""
+        try:
+            response = await self._request(
+                'POST',
+                f"{self.auth_server_url}/authorize",
+                json={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "scope": scope
+                }
+            )
+            if response.status_code == 200:
+                return response.json()["code"]
+            logger.warning(f"{self.client_id}: authorization failed ({response.status_code}): {response.text}")
+            return None
+
+        except Exception as e:
+            logger.error(f"{self.client_id}: authorization error: {str(e)}")
+            return None
+
+    async def get_token(self, auth_code):
+        """Second step: Exchange auth code for token"""
+        try:
+            response = await self._request(
+                'POST',
+                f"{self.auth_server_url}/token",
+                data={
+                    "code": auth_code,
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "grant_type": "authorization_code"
+                }
+            )
+            if response.status_code == 200:
+                self.token = response.json()["access_token"]
+                return self.token
+            logger.warning(f"{self.client_id}: token exchange failed ({response.status_code}): {response.text}")
+            return None
+
+        except Exception as e:
+            logger.error(f"{self.client_id}: token exchange error: {str(e)}")
+            return None
+
+    async def get_client_credentials_token(self, scope):
+        """Get a token straight from the client credentials, without an auth code"""
+        try:
+            response = await self._request(
+                'POST',
+                f"{self.auth_server_url}/token",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "scope": scope,
+                    "grant_type": "client_credentials"
+                }
+            )
+            if response.status_code == 200:
+                self.token = response.json()["access_token"]
+                return self.token
+            logger.warning(f"{self.client_id}: client_credentials token failed ({response.status_code}): {response.text}")
+            return None
+
+        except Exception as e:
+            logger.error(f"{self.client_id}: client_credentials token error: {str(e)}")
+            return None
+
+    async def sign_nonce(self, nonce):
+        """Sign nonce in the executor so the event loop keeps running"""
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, sign_resource_nonce, nonce, self.private_key)
+        except Exception as e:
+            logger.error(f"{self.client_id}: error signing nonce: {str(e)}")
+            return None
+
+    async def _signed_headers(self):
+        """Fetch a fresh nonce from the resource server and sign it"""
+        nonce_response = await self._request('GET', f"{self.resource_server_url}/get-nonce")
+        if nonce_response.status_code != 200:
+            logger.warning(f"{self.client_id}: failed to get nonce: {nonce_response.text}")
+            return None
+
+        nonce = nonce_response.json()["nonce"]
+        signature = await self.sign_nonce(nonce)
+        if not signature:
+            return None
+        return {'X-Nonce': nonce, 'X-Signature': signature}
+
+    async def get_data(self, endpoint):
+        """Complete flow to get data from resource server"""
+        try:
+            headers = await self._signed_headers()
+            if headers is None:
+                return None
+            headers['Content-Type'] = 'application/json'
+
+            response = await self._request(
+                'GET',
+                f"{self.resource_server_url}/mercedes/telemetry/{self.client_id}",
+                headers=headers
+            )
+            if response.status_code != 200:
+                logger.warning(f"{self.client_id}: error response: {response.text}")
+                return None
+
+            return response.json()
+
+        except Exception as e:
+            logger.error(f"{self.client_id}: error getting data: {str(e)}")
+            return None
+
+    async def upload_raw_telemetry(self, text):
+        """Send raw telemetry text to auth-server telemetry upload endpoint."""
+        if not self.token:
+            logger.warning(f"{self.client_id}: no access token - authorize first")
+            return False
+
+        try:
+            response = await self._request(
+                'POST',
+                f"{self.auth_server_url}/telemetry/upload-text",
+                headers={'Authorization': f'Bearer {self.token}'},
+                json={'car_id': self.client_id, 'text': text}
+            )
+            return response.status_code == 201
+        except Exception as e:
+            logger.error(f"{self.client_id}: telemetry upload error: {str(e)}")
+            return False
+
+    async def upload_file(self, file_path, version='1'):
+        """Upload a file to the resource server and register its hash on-chain"""
+        try:
+            if not self.token:
+                logger.warning(f"{self.client_id}: no access token - perform authorization first")
+                return False
+
+            filename = os.path.basename(file_path)
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(self.executor, read_file, file_path)
+
+            response = await self._request(
+                'POST',
+                f"{self.resource_server_url}/mercedes/upload/{self.client_id}",
+                headers={
+                    'Authorization': f'Bearer {self.token}',
+                    'X-Client-Address': self.address
+                },
+                files={'file': (filename, content)},
+                data={'version': version}
+            )
+            if response.status_code != 200:
+                logger.warning(f"{self.client_id}: upload failed: {response.text}")
+                return False
+            return True
+
+        except Exception as e:
+            logger.error(f"{self.client_id}: error uploading file: {str(e)}")
+            return False
+
+    async def open_file_stream(self, filename, version='1'):
+        """Sign a nonce and open a streaming GET for a file on the resource server.
+
+        Returns the open response, or None if the nonce or request failed. The
+        caller is responsible for closing it; the response holds one of the
+        semaphore's permits until then, so the cap covers streamed bodies too.
+        """
+        headers = await self._signed_headers()
+        if headers is None:
+            return None
+        headers.update({
+            'X-Version': str(version),
+            'X-Client-Address': self.address
+        })
+
+        if filename == "latest_update":
+            filename = f"{self.client_id}_latest_update"
+
+        request = self.http.build_request(
+            'GET',
+            f"{self.resource_server_url}/mercedes/files/{self.client_id}/{filename}",
+            headers=headers
+        )
+        await self.semaphore.acquire()
+        try:
+            response = await self.http.send(request, stream=True)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        if response.is_closed:
+            # The transport already read the whole body
+            self.semaphore.release()
+        else:
+            response.stream = PermitStream(response.stream, self.semaphore)
+
+        if response.status_code != 200:
+            await response.aread()
+            logger.warning(f"{self.client_id}: error downloading file: {response.text}")
+            await response.aclose()
+            return None
+        return response
+
+    async def download_file(self, filename, version='1', save_path=None):
+        """Download and verify file from resource server"""
+        try:
+            response = await self.open_file_stream(filename, version)
+            if response is None:
+                return False
+
+            if filename == "latest_update":
+                filename = f"{self.client_id}_latest_update"
+            if save_path is None:
+                save_path = os.path.join('downloads', self.client_id, filename)
+
+            os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+
+            # File writes run in the executor, batched so each one is worth the hand-off
+            loop = asyncio.get_running_loop()
+            sha3_hash = hashlib.sha3_256()
+            buffer = bytearray()
+            try:
+                f = await loop.run_in_executor(self.executor, open, save_path, 'wb')
+                try:
+                    async for chunk in response.aiter_bytes(8192):
+                        sha3_hash.update(chunk)
+                        buffer += chunk
+                        if len(buffer) >= DOWNLOAD_WRITE_BYTES:
+                            await loop.run_in_executor(self.executor, f.write, bytes(buffer))
+                            buffer.clear()
+                    if buffer:
+                        await loop.run_in_executor(self.executor, f.write, bytes(buffer))
+                finally:
+                    await loop.run_in_executor(self.executor, f.close)
+            finally:
+                await response.aclose()
+
+            if '0x' + sha3_hash.hexdigest() != response.headers.get('X-File-Hash'):
+                logger.warning(f"{self.client_id}: file hash mismatch")
+                os.remove(save_path)
+                return False
+            return True
+
+        except Exception as e:
+            logger.error(f"{self.client_id}: error downloading file: {str(e)}")
+            return False
+
+async def run_vehicle(client, mode, scope):
+    """Authorize one vehicle and fetch its telemetry (mode 1) or update file (mode 2)"""
+    result = {'client_id': client.client_id, 'success': False, 'timings_ms': {}}
+    timings = result['timings_ms']
+
+    started = time.perf_counter()
+    auth_code = await client.authorize(scope)
+    timings['authorize'] = round((time.perf_counter() - started) * 1000, 2)
+    if not auth_code:
+        result['error'] = 'authorization failed'
+        return result
+
+    started = time.perf_counter()
+    token = await client.get_token(auth_code)
+    timings['token'] = round((time.perf_counter() - started) * 1000, 2)
+    if not token:
+        result['error'] = 'token exchange failed'
+        return result
+
+    started = time.perf_counter()
+    if mode == "2":
+        result['success'] = await client.download_file(
+            filename="latest_update",
+            version="1",
+            save_path=f"downloads/{client.client_id}_latest_update.txt"
+        )
+        timings['download'] = round((time.perf_counter() - started) * 1000, 2)
+    else:
+        data = await client.get_data("engine_start")
+        timings['data'] = round((time.perf_counter() - started) * 1000, 2)
+        result['success'] = data is not None
+        result['data'] = data
+
+    if not result['success']:
+        result['error'] = 'resource request failed'
+    return result
+
+async def stream_fleet(client_ids=None, mode="1", concurrency=DEFAULT_CONCURRENCY,
+                       auth_server_url="http://localhost:5001", resource_server_url="http://localhost:5002",
+                       secret_for=default_client_secret, scope=None, accounts=None):
+    """Run the full flow for every vehicle, yielding each result as soon as it finishes"""
+    accounts = accounts if accounts is not None else load_accounts()
+    if client_ids is None:
+        client_ids = [name for name in accounts if name.startswith('tesla_')]
+
+    if scope is None:
+        scope = "file_download" if mode == "2" else "engine_start door_unlock"
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=30, limits=limits) as http:
+        clients = [
+            AsyncCombinedClient(
+                client_id, secret_for(client_id), auth_server_url, resource_server_url,
+                http_client=http, semaphore=semaphore, accounts=accounts
+            )
+            for client_id in client_ids
+        ]
+        for finished in asyncio.as_completed([run_vehicle(client, mode, scope) for client in clients]):
+            yield await finished
+
+async def run_fleet(client_ids=None, mode="1", concurrency=DEFAULT_CONCURRENCY,
+                    auth_server_url="http://localhost:5001", resource_server_url="http://localhost:5002",
+                    secret_for=default_client_secret):
+    """Run the full flow for every vehicle at once with at most `concurrency` requests in flight"""
+    results = [
+        result async for result in stream_fleet(
+            client_ids, mode, concurrency, auth_server_url, resource_server_url, secret_for
+        )
+    ]
+    return sorted(results, key=lambda result: result['client_id'])
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CONCURRENCY
+
+    print("🚗 Starting Async Fleet Test")
+    print(f"⏰ Test started at: {datetime.now()}\n")
+
+    results = asyncio.run(run_fleet(concurrency=concurrency))
+    succeeded = sum(1 for result in results if result['success'])
+
+    for result in results:
+        status = "✅" if result['success'] else f"❌ {result.get('error')}"
+        print(f"{result['client_id']}: {status}")
+    print(f"\n{succeeded}/{len(results)} vehicles completed the flow")
+
+if __name__ == "__main__":
+    main()
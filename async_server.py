@@ -0,0 +1,1135 @@
+"""ASGI version of the server.py gateway.
+
+Serves the same /api/* routes and JSON contracts as server.py, but every
+upstream call (auth server, resource server, geth) is awaited instead of
+blocking a worker thread.
+
+Run with:
+    hypercorn async_server:app --bind 0.0.0.0:8000
+or:
+    python async_server.py
+"""
+from quart import Quart, request, jsonify, make_response
+from quart_cors import cors
+import asyncio
+import json
+from web3 import AsyncWeb3
+from eth_account import Account
+from eth_account.messages import encode_defunct
+import jwt
+from datetime import datetime
+import os
+from dotenv import load_dotenv
+import uuid
+import traceback
+import hashlib
+import time
+import httpx
+from async_combined_client import AsyncCombinedClient
+from jwks_cache import get_jwks_cache, hs256_secret
+
+# Load environment variables
+load_dotenv()
+
+app = Quart(__name__)
+app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-flask-secret-key-here')
+
+# Enable CORS for React frontend
+app = cors(app, allow_origin=["http://localhost:3000", "http://localhost:5173"], allow_credentials=True)
+
+WEB3_PROVIDER_URL = os.getenv('WEB3_PROVIDER_URL', 'http://localhost:8545')
+UPSTREAM_TIMEOUT = float(os.getenv('GATEWAY_UPSTREAM_TIMEOUT', '10'))
+UPSTREAM_CONCURRENCY = int(os.getenv('GATEWAY_UPSTREAM_CONCURRENCY', '100'))
+
+# In-memory storage for session data (use Redis/database in production)
+sessions = {}
+
+# Per-session queues feeding the /api/session/<id>/events SSE streams
+session_subscribers = {}
+SSE_HEARTBEAT_SECONDS = 15
+
+# Chunk size used when piping resource-server downloads through the gateway
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Shared upstream clients, created once the event loop is running
+http_client = None
+upstream_semaphore = None
+w3 = None
+_accounts = None
+
+# Pending transaction counts, read from the node once per address like nonce_manager's
+pending_nonces = {}
+
+@app.before_serving
+async def startup():
+    """Open the shared HTTP client and async Web3 provider"""
+    global http_client, upstream_semaphore, w3
+    http_client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT)
+    upstream_semaphore = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(WEB3_PROVIDER_URL))
+
+@app.after_serving
+async def shutdown():
+    """Close the shared HTTP client"""
+    await http_client.aclose()
+
+def load_accounts():
+    """Load accounts.json once and keep it in memory"""
+    global _accounts
+    if _accounts is None:
+        with open('accounts.json', 'r') as f:
+            _accounts = json.load(f)
+    return _accounts
+
+def get_session_data(session_id):
+    """Get session data by session ID"""
+    return sessions.get(session_id, {})
+
+def update_session_data(session_id, data):
+    """Update session data"""
+    if session_id not in sessions:
+        sessions[session_id] = {}
+    sessions[session_id].update(data)
+
+    # Push step transitions and their results to SSE subscribers
+    if 'step' in data:
+        publish_session_event(session_id, 'step', {k: v for k, v in data.items() if k != 'last_activity'})
+
+def publish_session_event(session_id, event, data):
+    """Send an event to every SSE stream open on this session"""
+    for subscriber in session_subscribers.get(session_id, ()):
+        subscriber.put_nowait((event, data))
+
+def format_sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def current_nonce(address):
+    """The address's pending transaction count, read from the node on first use only"""
+    if address not in pending_nonces:
+        pending_nonces[address] = await w3.eth.get_transaction_count(address, 'pending')
+    return pending_nonces[address]
+
+def get_account(config):
+    """Return (address, private_key) for the configured client"""
+    account = load_accounts()[config.get('client_id')]
+    return account['address'], account['private_key']
+
+def verify_token(token, auth_server_url=None):
+    """Verify the JWT token with the auth server's published key for its kid"""
+    try:
+        # Extract token from Bearer format if present
+        if token.startswith('Bearer '):
+            token = token.split(' ')[1]
+
+        payload = get_jwks_cache(auth_server_url).decode(token, hs256_secret())
+
+        # Verify required claims
+        if not all(k in payload for k in ['client_id', 'vin', 'scope']):
+            return False, "Token missing required claims"
+
+        return True, payload
+
+    except jwt.ExpiredSignatureError:
+        return False, "Token has expired"
+    except jwt.InvalidTokenError as e:
+        return False, f"Invalid token: {str(e)}"
+
+def sign_and_recover(message, private_key):
+    """Sign a plain-text message and recover its signer address"""
+    signable = encode_defunct(message.encode('utf-8'))
+    signature = Account.sign_message(signable, private_key=private_key).signature.hex()
+    recovered_address = Account.recover_message(signable, signature=bytes.fromhex(signature))
+    return signature, recovered_address
+
+def create_client_instance(config):
+    """Create an AsyncCombinedClient on the shared connection pool"""
+    return AsyncCombinedClient(
+        client_id=config.get('client_id'),
+        client_secret=config.get('client_secret'),
+        auth_server_url=config.get('auth_server'),
+        resource_server_url=config.get('resource_server'),
+        http_client=http_client,
+        semaphore=upstream_semaphore,
+        accounts=load_accounts()
+    )
+
+def timed_step(timings, name, started):
+    """Record the duration of a pipeline step in milliseconds"""
+    timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint"""
+    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+
+@app.route('/api/session/create', methods=['POST'])
+async def create_session():
+    """Create a new session"""
+    try:
+        session_id = str(uuid.uuid4())
+        sessions[session_id] = {
+            'step': 1,
+            'created_at': datetime.now().isoformat(),
+            'last_activity': datetime.now().isoformat()
+        }
+
+        app.logger.info(f"Created new session: {session_id}")
+
+        return jsonify({
+            "success": True,
+            "session_id": session_id,
+            "step": 1,
+            "message": "Session created successfully"
+        })
+    except Exception as e:
+        app.logger.error(f"Error creating session: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/session/<session_id>', methods=['GET'])
+async def get_session(session_id):
+    """Get session status"""
+    try:
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        # Update last activity
+        update_session_data(session_id, {
+            'last_activity': datetime.now().isoformat()
+        })
+
+        return jsonify({
+            "success": True,
+            "session_data": session_data
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/session/<session_id>/events', methods=['GET'])
+async def session_events(session_id):
+    """Stream session step transitions as server-sent events"""
+    if session_id not in sessions:
+        return jsonify({
+            "success": False,
+            "error": "Session not found"
+        }), 404
+
+    async def stream():
+        subscriber = asyncio.Queue()
+        session_subscribers.setdefault(session_id, []).append(subscriber)
+        try:
+            yield format_sse('snapshot', dict(get_session_data(session_id)))
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+                if event == 'closed':
+                    break
+        finally:
+            remaining = session_subscribers.get(session_id, [])
+            if subscriber in remaining:
+                remaining.remove(subscriber)
+            if not remaining:
+                session_subscribers.pop(session_id, None)
+
+    response = await make_response(stream(), {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.timeout = None
+    return response
+
+@app.route('/api/auth/configure', methods=['POST'])
+async def configure_client():
+    """Configure OAuth client and request authorization code from auth server"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        # Check if session exists
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        # Extract configuration
+        client_id = data.get('client_id', 'tesla_models_3')
+        client_secret = data.get('client_secret', 'tesla_secret_3')
+        auth_server = data.get('auth_server', 'http://localhost:5001')
+        resource_server = data.get('resource_server', 'http://localhost:5002')
+        mode = data.get('mode', '1')  # "1" for telemetry, "2" for file download
+        scopes = data.get('scopes', ['engine_start', 'door_unlock'])
+
+        # Handle scopes based on mode
+        if mode == "2":  # File download mode
+            scopes = ["file_download"]
+
+        # Create scope string
+        scope_string = " ".join(scopes)
+
+        # Request authorization code from auth server
+        try:
+            auth_url = f"{auth_server}/authorize"
+            auth_payload = {
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'scope': scope_string
+            }
+
+            app.logger.info(f"Requesting auth code from {auth_url} with payload: {auth_payload}")
+
+            response = await http_client.post(auth_url, json=auth_payload)
+
+            if response.status_code == 200:
+                auth_code = response.json().get('code')
+
+                if not auth_code:
+                    return jsonify({
+                        "success": False,
+                        "error": "No authorization code received from auth server"
+                    }), 400
+
+                app.logger.info(f"Session {session_id} received auth code from server: {auth_code}")
+
+            else:
+                app.logger.error(f"Auth server returned status {response.status_code}: {response.text}")
+                return jsonify({
+                    "success": False,
+                    "error": f"Auth server error: {response.text}"
+                }), response.status_code
+
+        except httpx.HTTPError as e:
+            app.logger.error(f"Failed to connect to auth server: {str(e)}")
+            return jsonify({
+                "success": False,
+                "error": f"Could not connect to auth server: {str(e)}"
+            }), 500
+
+        # Store configuration and auth code in session
+        config_data = {
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'auth_server': auth_server,
+            'resource_server': resource_server,
+            'mode': mode,
+            'scopes': scopes,
+            'scope_string': scope_string
+        }
+
+        update_session_data(session_id, {
+            'client_config': config_data,
+            'generated_auth_code': auth_code,
+            'step': 1.5,
+            'last_activity': datetime.now().isoformat()
+        })
+
+        return jsonify({
+            "success": True,
+            "auth_code": auth_code,
+            "step": 1.5,
+            "config": {
+                "mode": mode,
+                "scopes": scopes,
+                "client_id": client_id,
+                "auth_server": auth_server,
+                "resource_server": resource_server
+            },
+            "message": "Client configured and authorization code received"
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error configuring client: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), 500
+
+@app.route('/api/auth/validate-code', methods=['POST'])
+async def validate_auth_code():
+    """Validate authorization code"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+        input_code = data.get('auth_code')
+
+        if not session_id or not input_code:
+            return jsonify({
+                "success": False,
+                "error": "Session ID and authorization code required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        generated_code = session_data.get('generated_auth_code')
+
+        if not generated_code:
+            return jsonify({
+                "success": False,
+                "error": "No authorization code found for this session"
+            }), 400
+
+        if input_code.strip() == generated_code:
+            update_session_data(session_id, {
+                'validated_auth_code': input_code,
+                'step': 2,
+                'last_activity': datetime.now().isoformat()
+            })
+
+            app.logger.info(f"Session {session_id} auth code validated successfully")
+
+            return jsonify({
+                "success": True,
+                "step": 2,
+                "message": "Authorization code validated successfully"
+            })
+        else:
+            app.logger.warning(f"Session {session_id} invalid auth code attempt: {input_code}")
+            return jsonify({
+                "success": False,
+                "error": "Invalid authorization code"
+            }), 400
+
+    except Exception as e:
+        app.logger.error(f"Error validating auth code: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/token/generate', methods=['POST'])
+async def generate_token():
+    """Generate access token"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        # Check if auth code was validated
+        validated_auth_code = session_data.get('validated_auth_code')
+        if not validated_auth_code:
+            return jsonify({
+                "success": False,
+                "error": "Authorization code not validated"
+            }), 400
+
+        config = session_data.get('client_config', {})
+
+        try:
+            token = await create_client_instance(config).get_token(validated_auth_code)
+
+            if token:
+                update_session_data(session_id, {
+                    'generated_token': token,
+                    'step': 2.5,
+                    'last_activity': datetime.now().isoformat()
+                })
+
+                return jsonify({
+                    "success": True,
+                    "token": token,
+                    "step": 2.5,
+                    "message": "Access token generated successfully"
+                })
+            else:
+                app.logger.error(f"Session {session_id} - Token exchange returned None")
+                return jsonify({
+                    "success": False,
+                    "error": "Token generation failed - no token received"
+                }), 400
+
+        except Exception as token_error:
+            app.logger.error(f"Session {session_id} - Token exchange error: {str(token_error)}")
+            return jsonify({
+                "success": False,
+                "error": f"Token exchange failed: {str(token_error)}"
+            }), 400
+
+    except Exception as e:
+        app.logger.error(f"Error generating token: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/debug/token-request', methods=['POST'])
+async def debug_token_request():
+    """Debug token request details"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({"error": "Session ID required"}), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({"error": "Session not found"}), 404
+
+        config = session_data.get('client_config', {})
+        validated_auth_code = session_data.get('validated_auth_code')
+
+        token_request_data = {
+            'grant_type': 'authorization_code',
+            'code': validated_auth_code,
+            'client_id': config.get('client_id'),
+            'client_secret': config.get('client_secret'),
+            'redirect_uri': 'http://localhost:3000/callback'
+        }
+
+        return jsonify({
+            "success": True,
+            "token_request_data": token_request_data,
+            "auth_server_url": config.get('auth_server'),
+            "session_step": session_data.get('step'),
+            "has_validated_code": bool(validated_auth_code)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/token/validate', methods=['POST'])
+async def validate_token():
+    """Validate token with resource server"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        token = session_data.get('generated_token')
+        if not token:
+            return jsonify({
+                "success": False,
+                "error": "No token found"
+            }), 400
+
+        # Ensure token is in correct format
+        if not token.startswith('Bearer '):
+            token = f'Bearer {token}'
+
+        # Verify token; a JWKS fetch on a key-cache miss would block the event loop
+        auth_server = session_data.get('client_config', {}).get('auth_server')
+        is_valid, message = await asyncio.to_thread(verify_token, token, auth_server)
+
+        if is_valid:
+            update_session_data(session_id, {
+                'validated_token': token,
+                'token_validated': True,
+                'step': 2.75,
+                'last_activity': datetime.now().isoformat()
+            })
+
+            app.logger.info(f"Session {session_id} token validated successfully")
+
+            return jsonify({
+                "success": True,
+                "message": "Token validated successfully",
+                "step": 2.75,
+                "token_details": message if isinstance(message, dict) else None
+            })
+        else:
+            return jsonify({
+                "success": False,
+                "error": f"Token validation failed: {message}"
+            }), 400
+
+    except Exception as e:
+        app.logger.error(f"Error validating token: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/nonce/request', methods=['POST'])
+async def request_nonce():
+    """Request nonce from blockchain"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        config = session_data.get('client_config', {})
+        address, _ = get_account(config)
+
+        nonce = await current_nonce(address)
+
+        update_session_data(session_id, {
+            'nonce': nonce,
+            'blockchain_address': address,
+            'step': 2.8,
+            'last_activity': datetime.now().isoformat()
+        })
+
+        app.logger.info(f"Session {session_id} nonce requested: {nonce}")
+
+        return jsonify({
+            "success": True,
+            "nonce": nonce,
+            "address": address,
+            "step": 2.8,
+            "message": "Nonce retrieved successfully"
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error requesting nonce: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/nonce/sign', methods=['POST'])
+async def sign_nonce():
+    """Sign the nonce"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        nonce = session_data.get('nonce')
+        if nonce is None:
+            return jsonify({
+                "success": False,
+                "error": "No nonce found"
+            }), 400
+
+        config = session_data.get('client_config', {})
+        address, private_key = get_account(config)
+
+        # Signing is CPU-bound, keep it off the event loop
+        message = f"Nonce: {str(nonce)}"
+        signature, recovered_address = await asyncio.to_thread(sign_and_recover, message, private_key)
+
+        signature_valid = recovered_address.lower() == address.lower()
+
+        if signature_valid:
+            update_session_data(session_id, {
+                'signature': signature,
+                'signed_message': message,
+                'step': 3,
+                'last_activity': datetime.now().isoformat()
+            })
+
+            app.logger.info(f"Session {session_id} nonce signed successfully")
+
+            return jsonify({
+                "success": True,
+                "signature": signature,
+                "message": message,
+                "verified": True,
+                "step": 3,
+                "message_text": "Nonce signed successfully"
+            })
+        else:
+            return jsonify({
+                "success": False,
+                "error": "Signature verification failed"
+            }), 400
+
+    except Exception as e:
+        app.logger.error(f"Error signing nonce: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/resource/telemetry', methods=['POST'])
+async def get_telemetry():
+    """Get telemetry data"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        config = session_data.get('client_config', {})
+
+        token = session_data.get('validated_token')
+        if not token:
+            return jsonify({
+                "success": False,
+                "error": "No validated token found"
+            }), 400
+
+        # Get data
+        data = await create_client_instance(config).get_data(data.get('scope', 'engine_start'))
+
+        if data:
+            update_session_data(session_id, {
+                'last_data': data,
+                'step': 4,
+                'last_activity': datetime.now().isoformat()
+            })
+
+            app.logger.info(f"Session {session_id} telemetry data retrieved")
+
+            return jsonify({
+                "success": True,
+                "data": data,
+                "step": 4,
+                "message": "Telemetry data retrieved successfully"
+            })
+        else:
+            return jsonify({
+                "success": False,
+                "error": "No data received from server"
+            }), 400
+
+    except Exception as e:
+        app.logger.error(f"Error getting telemetry: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/resource/download', methods=['POST'])
+async def download_file():
+    """Download file"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('session_id')
+        filename = data.get('filename', 'latest_update')
+        version = data.get('version', '1')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        config = session_data.get('client_config', {})
+        client_id = config.get('client_id')
+
+        token = session_data.get('validated_token')
+        if not token:
+            return jsonify({
+                "success": False,
+                "error": "No validated token found"
+            }), 400
+
+        # Create downloads directory if it doesn't exist
+        os.makedirs('downloads', exist_ok=True)
+
+        save_path = f"downloads/{client_id}_{filename}.txt"
+        success = await create_client_instance(config).download_file(
+            filename=filename,
+            version=version,
+            save_path=save_path
+        )
+
+        if success:
+            update_session_data(session_id, {
+                'downloaded_file': save_path,
+                'step': 4,
+                'last_activity': datetime.now().isoformat()
+            })
+
+            app.logger.info(f"Session {session_id} file downloaded: {save_path}")
+
+            return jsonify({
+                "success": True,
+                "file_path": save_path,
+                "step": 4,
+                "message": "File downloaded successfully"
+            })
+        else:
+            return jsonify({
+                "success": False,
+                "error": "Download failed"
+            }), 400
+
+    except Exception as e:
+        app.logger.error(f"Error downloading file: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/resource/download/stream', methods=['GET', 'POST'])
+async def stream_download():
+    """Pipe a verified file from the resource server straight to the caller"""
+    try:
+        data = (await request.get_json(silent=True)) if request.method == 'POST' else request.args
+        data = data or {}
+        session_id = data.get('session_id')
+        filename = data.get('filename', 'latest_update')
+        version = data.get('version', '1')
+
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+
+        if not session_data.get('validated_token'):
+            return jsonify({
+                "success": False,
+                "error": "No validated token found"
+            }), 400
+
+        config = session_data.get('client_config', {})
+        upstream = await create_client_instance(config).open_file_stream(filename, version)
+        if upstream is None:
+            return jsonify({
+                "success": False,
+                "error": "Download failed"
+            }), 400
+
+        server_hash = upstream.headers.get('X-File-Hash')
+        if not server_hash:
+            # Without the resource server's hash the stream cannot be verified
+            await upstream.aclose()
+            return jsonify({
+                "success": False,
+                "error": "Resource server did not send a file hash"
+            }), 502
+
+        async def generate():
+            sha3_hash = hashlib.sha3_256()
+            # The last chunk is held back until the hash matches, so a mismatch
+            # leaves the caller short of Content-Length instead of with a full body
+            held = b''
+            try:
+                async for chunk in upstream.aiter_bytes(STREAM_CHUNK_SIZE):
+                    sha3_hash.update(chunk)
+                    if held:
+                        yield held
+                    held = chunk
+            finally:
+                await upstream.aclose()
+
+            calculated_hash = '0x' + sha3_hash.hexdigest()
+            if calculated_hash != server_hash:
+                app.logger.error(f"Session {session_id} streamed file hash mismatch: {calculated_hash} != {server_hash}")
+                raise IOError("File hash mismatch")
+            if held:
+                yield held
+
+            update_session_data(session_id, {
+                'streamed_file': filename,
+                'streamed_file_hash': calculated_hash,
+                'step': 4,
+                'last_activity': datetime.now().isoformat()
+            })
+
+        headers = {
+            'Content-Type': upstream.headers.get('Content-Type', 'application/octet-stream'),
+            'Content-Disposition': upstream.headers.get('Content-Disposition', f'attachment; filename={filename}'),
+            'X-File-Hash': server_hash,
+            'X-File-Version': upstream.headers.get('X-File-Version', str(version)),
+            'Access-Control-Expose-Headers': 'X-File-Hash, X-File-Version, Content-Disposition'
+        }
+        if 'Content-Length' in upstream.headers:
+            headers['Content-Length'] = upstream.headers['Content-Length']
+
+        response = await make_response(generate(), headers)
+        response.timeout = None
+        return response
+
+    except Exception as e:
+        app.logger.error(f"Error streaming file: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/flow/run', methods=['POST'])
+async def run_flow():
+    """Run the whole wizard pipeline server-side in a single request"""
+    timings = {}
+    flow_start = time.perf_counter()
+    step = None
+
+    def flow_failed(error, status=400):
+        timings['total'] = round((time.perf_counter() - flow_start) * 1000, 2)
+        return jsonify({
+            "success": False,
+            "failed_step": step,
+            "error": error,
+            "timings_ms": timings
+        }), status
+
+    try:
+        data = await request.get_json() or {}
+
+        mode = data.get('mode', '1')  # "1" for telemetry, "2" for file download
+        scopes = data.get('scopes', ['engine_start', 'door_unlock'])
+        if mode == "2":  # File download mode
+            scopes = ["file_download"]
+
+        config = {
+            'client_id': data.get('client_id', 'tesla_models_3'),
+            'client_secret': data.get('client_secret', 'tesla_secret_3'),
+            'auth_server': data.get('auth_server', 'http://localhost:5001'),
+            'resource_server': data.get('resource_server', 'http://localhost:5002')
+        }
+        client = create_client_instance(config)
+        address, private_key = client.address, client.private_key
+
+        # Step 1: Authorization code
+        step, started = 'authorize', time.perf_counter()
+        response = await http_client.post(
+            f"{config['auth_server'].rstrip('/')}/authorize",
+            json={
+                'client_id': config['client_id'],
+                'client_secret': config['client_secret'],
+                'scope': " ".join(scopes)
+            }
+        )
+        auth_code = response.json().get('code') if response.status_code == 200 else None
+        timed_step(timings, step, started)
+        if not auth_code:
+            return flow_failed(f"Auth server error: {response.text}")
+
+        # Step 2: Token exchange
+        step, started = 'token_generate', time.perf_counter()
+        token = await client.get_token(auth_code)
+        timed_step(timings, step, started)
+        if not token:
+            return flow_failed("Token generation failed - no token received")
+
+        # Step 3: Token validation
+        step, started = 'token_validate', time.perf_counter()
+        is_valid, token_details = await asyncio.to_thread(verify_token, f'Bearer {token}', config['auth_server'])
+        timed_step(timings, step, started)
+        if not is_valid:
+            return flow_failed(f"Token validation failed: {token_details}")
+
+        # Step 4: Blockchain nonce
+        step, started = 'nonce_request', time.perf_counter()
+        nonce = await current_nonce(address)
+        timed_step(timings, step, started)
+
+        # Step 5: Sign nonce
+        step, started = 'nonce_sign', time.perf_counter()
+        message = f"Nonce: {str(nonce)}"
+        signature, recovered_address = await asyncio.to_thread(sign_and_recover, message, private_key)
+        timed_step(timings, step, started)
+        if recovered_address.lower() != address.lower():
+            return flow_failed("Signature verification failed")
+
+        result = {
+            "token": token,
+            "token_details": token_details,
+            "nonce": nonce,
+            "address": address,
+            "signature": signature,
+            "signed_message": message
+        }
+
+        # Step 6: Resource access
+        if mode == "2":
+            step, started = 'resource_download', time.perf_counter()
+            filename = data.get('filename', 'latest_update')
+            os.makedirs('downloads', exist_ok=True)
+            save_path = f"downloads/{config['client_id']}_{filename}.txt"
+            success = await client.download_file(filename, data.get('version', '1'), save_path)
+            timed_step(timings, step, started)
+            if not success:
+                return flow_failed("Download failed")
+            result['file_path'] = save_path
+        else:
+            step, started = 'resource_telemetry', time.perf_counter()
+            telemetry = await client.get_data(data.get('scope', 'engine_start'))
+            timed_step(timings, step, started)
+            if not telemetry:
+                return flow_failed("No data received from server")
+            result['data'] = telemetry
+
+        timings['total'] = round((time.perf_counter() - flow_start) * 1000, 2)
+
+        return jsonify({
+            "success": True,
+            "step": 4,
+            "result": result,
+            "timings_ms": timings,
+            "message": "Flow completed successfully"
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error running flow: {str(e)}")
+        return flow_failed(str(e), 500)
+
+@app.route('/api/session/<session_id>/reset', methods=['POST'])
+async def reset_session(session_id):
+    """Reset session to start over"""
+    try:
+        if session_id in sessions:
+            sessions[session_id] = {
+                'step': 1,
+                'created_at': datetime.now().isoformat(),
+                'last_activity': datetime.now().isoformat()
+            }
+            publish_session_event(session_id, 'reset', dict(sessions[session_id]))
+
+            app.logger.info(f"Session {session_id} reset")
+
+        return jsonify({
+            "success": True,
+            "step": 1,
+            "message": "Session reset successfully"
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error resetting session: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/sessions/cleanup', methods=['POST'])
+async def cleanup_sessions():
+    """Clean up old sessions (call this periodically)"""
+    try:
+        current_time = datetime.now()
+        expired_sessions = []
+
+        for session_id, session_data in sessions.items():
+            created_at = datetime.fromisoformat(session_data.get('created_at', current_time.isoformat()))
+            if (current_time - created_at).total_seconds() > 3600:  # 1 hour
+                expired_sessions.append(session_id)
+
+        for session_id in expired_sessions:
+            del sessions[session_id]
+            publish_session_event(session_id, 'closed', {'reason': 'expired'})
+            app.logger.info(f"Cleaned up expired session: {session_id}")
+
+        return jsonify({
+            "success": True,
+            "cleaned_sessions": len(expired_sessions),
+            "message": f"Cleaned up {len(expired_sessions)} expired sessions"
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error cleaning up sessions: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/sessions/list', methods=['GET'])
+async def list_sessions():
+    """List all active sessions (for debugging)"""
+    try:
+        session_list = []
+        for session_id, session_data in sessions.items():
+            session_list.append({
+                'session_id': session_id,
+                'step': session_data.get('step', 1),
+                'created_at': session_data.get('created_at'),
+                'last_activity': session_data.get('last_activity')
+            })
+
+        return jsonify({
+            "success": True,
+            "sessions": session_list,
+            "total_sessions": len(session_list)
+        })
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+if __name__ == '__main__':
+    app.run(debug=True, host='0.0.0.0', port=int(os.getenv('GATEWAY_PORT', '8000')))
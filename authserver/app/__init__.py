@@ -1,9 +1,49 @@
 from flask import Flask
-from .models import db
+from sqlalchemy import inspect, text
+from .models import db, CarAuthCode, ConnectedCar, RevokedToken
+from .scopes import allowed_mask
+from .code_store import create_code_store, start_purge_worker
+from .car_cache import CarCache, install_invalidation
+from .signing_keys import SigningKeyRing
+from .segment_store import SegmentStore
 from .routes import auth_bp
 from .telemetry_routes import telemetry_bp
+from .revocation_routes import revocation_bp
 from config import Config
 
+def upgrade_scope_mask():
+    """Add and backfill connected_car.scope_mask on databases created before it existed"""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('connected_car')}
+    if 'scope_mask' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE connected_car ADD COLUMN scope_mask BIGINT'))
+
+    cars = ConnectedCar.query.filter(ConnectedCar.scope_mask.is_(None)).all()
+    for car in cars:
+        car.scope_mask = allowed_mask(car.scopes)
+    if cars:
+        db.session.commit()
+
+def upgrade_revoked_token():
+    """Rebuild a SQLite revoked_token table created without AUTOINCREMENT, keeping its rows"""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as connection:
+        sql = connection.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'revoked_token'"
+        )).scalar()
+        if not sql or 'AUTOINCREMENT' in sql.upper():
+            return
+        connection.execute(text('ALTER TABLE revoked_token RENAME TO revoked_token_old'))
+        for index in RevokedToken.__table__.indexes:
+            connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+        RevokedToken.__table__.create(connection)
+        connection.execute(text(
+            'INSERT INTO revoked_token (seq, jti, client_id, expires_at, revoked_at) '
+            'SELECT seq, jti, client_id, expires_at, revoked_at FROM revoked_token_old'
+        ))
+        connection.execute(text('DROP TABLE revoked_token_old'))
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -11,8 +51,40 @@ def create_app():
     db.init_app(app)
     app.register_blueprint(auth_bp)
     app.register_blueprint(telemetry_bp, url_prefix='/telemetry')
+    app.register_blueprint(revocation_bp)
 
     with app.app_context():
         db.create_all()
+        # create_all skips indexes on tables that already exist
+        for index in CarAuthCode.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        upgrade_scope_mask()
+        upgrade_revoked_token()
+
+    app.extensions['signing_keys'] = SigningKeyRing(
+        key_dir=app.config['JWT_KEY_DIR'],
+        algorithm=app.config['JWT_ALGORITHM'],
+        active_kid=app.config['JWT_ACTIVE_KID'],
+        secret_key=app.config['SECRET_KEY'],
+        accept_hs256=app.config['JWT_ACCEPT_HS256']
+    )
+    app.extensions['segment_store'] = SegmentStore(
+        root=app.config['TELEMETRY_SEGMENT_DIR'],
+        max_segment_bytes=app.config['TELEMETRY_SEGMENT_MAX_BYTES'],
+        max_segment_age=app.config['TELEMETRY_SEGMENT_MAX_AGE'],
+        index_interval=app.config['TELEMETRY_INDEX_INTERVAL'],
+        compress=app.config['TELEMETRY_SEGMENT_COMPRESS']
+    )
+    app.extensions['code_store'] = create_code_store(app.config['AUTH_CODE_STORE'])
+    app.extensions['car_cache'] = None
+    if app.config['CAR_CACHE_ENABLED']:
+        app.extensions['car_cache'] = CarCache(
+            max_size=app.config['CAR_CACHE_SIZE'],
+            ttl=app.config['CAR_CACHE_TTL'],
+            negative_ttl=app.config['CAR_NEGATIVE_CACHE_TTL']
+        )
+        install_invalidation(app.extensions['car_cache'])
+    if app.config['AUTH_CODE_PURGE_INTERVAL'] > 0:
+        start_purge_worker(app, app.config['AUTH_CODE_PURGE_INTERVAL'])
 
     return app
@@ -0,0 +1,107 @@
+"""In-process cache of ConnectedCar credentials.
+
+/authorize and /token look a car up by client_id on every call. This cache
+keeps an immutable snapshot of each car, not the ORM object, so a cached
+entry is never tied to a closed session. It is bounded with LRU eviction
+and entries expire after a TTL. Unknown client_ids are cached as misses for
+a shorter TTL, so repeated guesses do not reach the database.
+
+Inserts, updates and deletes of ConnectedCar drop the affected entries once
+the session commits. Bulk query.update() calls and other processes writing to
+the same database are only picked up when the TTL runs out.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from .models import ConnectedCar
+
+CarCredentials = namedtuple(
+    'CarCredentials',
+    ['client_id', 'client_secret', 'vin', 'model', 'year', 'scopes', 'scope_mask', 'scope_categories']
+)
+
+_MISSING = object()
+
+def snapshot(car):
+    return CarCredentials(
+        car.client_id, car.client_secret, car.vin, car.model, car.year, car.scopes, car.scope_mask,
+        car.scope_categories
+    )
+
+def load_car(client_id):
+    """Read one car straight from the database"""
+    car = ConnectedCar.query.filter_by(client_id=client_id).first()
+    return snapshot(car) if car else None
+
+class CarCache:
+    def __init__(self, max_size=10000, ttl=300, negative_ttl=30, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, client_id, loader=load_car):
+        """Return the cached snapshot for client_id, loading it on a miss"""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(client_id)
+                if entry[0] is _MISSING:
+                    self.stats['negative_hits'] += 1
+                    return None
+                self.stats['hits'] += 1
+                return entry[0]
+            self.stats['misses'] += 1
+
+        car = loader(client_id)
+        with self._lock:
+            if car is None:
+                self._entries[client_id] = (_MISSING, now + self.negative_ttl)
+            else:
+                self._entries[client_id] = (car, now + self.ttl)
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return car
+
+    def invalidate(self, client_id=None):
+        """Drop one client_id, or every entry when client_id is None"""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            if client_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(client_id, None)
+
+def get_car(client_id):
+    """Look up a car's credentials through the app's cache, if enabled"""
+    cache = current_app.extensions.get('car_cache')
+    return cache.get(client_id) if cache is not None else load_car(client_id)
+
+def install_invalidation(cache):
+    """Invalidate cached cars whenever a ConnectedCar change is committed"""
+    def remember(mapper, connection, target):
+        # Include the old client_id if this change renamed the car
+        client_ids = {target.client_id, *inspect(target).attrs.client_id.history.deleted}
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault('car_cache_dirty', set()).update(client_ids)
+        else:
+            for client_id in client_ids:
+                cache.invalidate(client_id)
+
+    def flush_dirty(session):
+        for client_id in session.info.pop('car_cache_dirty', ()):
+            cache.invalidate(client_id)
+
+    for mapper_event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(ConnectedCar, mapper_event, remember)
+    event.listen(Session, 'after_commit', flush_dirty)
+    event.listen(Session, 'after_rollback', flush_dirty)
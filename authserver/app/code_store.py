@@ -0,0 +1,124 @@
+"""Storage for short-lived authorization codes.
+
+SQLCodeStore keeps codes in the car_auth_code table. MemoryCodeStore keeps
+them in a process-local dict with a TTL and avoids the SQL round trips
+between /authorize and /token. It only works when the auth server runs as a
+single process. Config.AUTH_CODE_STORE selects the store.
+
+Codes are single-use. consume() marks a code used, or removes it, atomically,
+so two concurrent /token calls cannot both redeem the same code.
+"""
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from .models import db, CarAuthCode
+from .refresh_tokens import purge_expired_tokens
+
+PURGE_BATCH_SIZE = 10000
+
+class SQLCodeStore:
+    def save(self, code, client_id, vin, scope, expires_at, ip_address=None):
+        db.session.add(CarAuthCode(
+            code=code,
+            client_id=client_id,
+            vin=vin,
+            scope=scope,
+            expires_at=expires_at,
+            ip_address=ip_address
+        ))
+        db.session.commit()
+
+    def consume(self, code, client_id):
+        """Redeem a code, returning {'vin', 'scope'} or None if it is unknown, used or expired"""
+        auth_code = CarAuthCode.query.filter_by(
+            code=code,
+            client_id=client_id,
+            used=False
+        ).first()
+        if not auth_code or auth_code.expires_at < datetime.utcnow():
+            return None
+
+        # Conditional update so only one concurrent redemption wins
+        claimed = CarAuthCode.query.filter_by(id=auth_code.id, used=False).update(
+            {'used': True}, synchronize_session=False
+        )
+        db.session.commit()
+        if claimed != 1:
+            return None
+        return {'vin': auth_code.vin, 'scope': auth_code.scope}
+
+    def purge_expired(self, now=None):
+        """Delete expired codes in batches, returning how many rows were removed"""
+        now = now or datetime.utcnow()
+        removed = 0
+        while True:
+            batch = select(CarAuthCode.id).where(CarAuthCode.expires_at < now).limit(PURGE_BATCH_SIZE)
+            deleted = CarAuthCode.query.filter(CarAuthCode.id.in_(batch)).delete(synchronize_session=False)
+            db.session.commit()
+            removed += deleted
+            if deleted < PURGE_BATCH_SIZE:
+                return removed
+
+class MemoryCodeStore:
+    def __init__(self):
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def save(self, code, client_id, vin, scope, expires_at, ip_address=None):
+        with self._lock:
+            self._codes[code] = {
+                'client_id': client_id,
+                'vin': vin,
+                'scope': scope,
+                'expires_at': expires_at
+            }
+
+    def consume(self, code, client_id):
+        with self._lock:
+            entry = self._codes.get(code)
+            if not entry or entry['client_id'] != client_id:
+                return None
+            del self._codes[code]
+        if entry['expires_at'] < datetime.utcnow():
+            return None
+        return {'vin': entry['vin'], 'scope': entry['scope']}
+
+    def purge_expired(self, now=None):
+        now = now or datetime.utcnow()
+        with self._lock:
+            expired = [code for code, entry in self._codes.items() if entry['expires_at'] < now]
+            for code in expired:
+                del self._codes[code]
+        return len(expired)
+
+def create_code_store(name):
+    if name == 'memory':
+        return MemoryCodeStore()
+    if name == 'sql':
+        return SQLCodeStore()
+    raise ValueError(f"Unknown AUTH_CODE_STORE: {name}")
+
+def get_code_store():
+    return current_app.extensions['code_store']
+
+def start_purge_worker(app, interval):
+    """Purge expired codes and refresh tokens every `interval` seconds in a daemon thread"""
+    def purge_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    removed = get_code_store().purge_expired()
+                    removed_refresh = purge_expired_tokens()
+                if removed or removed_refresh:
+                    app.logger.info(
+                        f"Purged {removed} expired authorization codes and {removed_refresh} refresh/revoked tokens"
+                    )
+            except Exception as e:
+                app.logger.error(f"Purging expired codes and refresh tokens failed: {str(e)}")
+
+    worker = threading.Thread(target=purge_loop, daemon=True)
+    worker.start()
+    return worker
@@ -1,5 +1,7 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from .scopes import sync_scope_mask
 
 db = SQLAlchemy()
 
@@ -12,10 +14,14 @@ class ConnectedCar(db.Model):
     model = db.Column(db.String(100))
     year = db.Column(db.Integer)
     scopes = db.Column(db.String(1000))  # Available permissions
+    scope_mask = db.Column(db.BigInteger)  # scopes compiled by app.scopes; kept in sync on save
     scope_categories = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_authorized = db.Column(db.DateTime)
 
+event.listen(ConnectedCar, 'before_insert', sync_scope_mask)
+event.listen(ConnectedCar, 'before_update', sync_scope_mask)
+
 class TelemetryFile(db.Model):
     """Metadata for uploaded raw telemetry files"""
     id = db.Column(db.Integer, primary_key=True)
@@ -23,14 +29,61 @@ class TelemetryFile(db.Model):
     filename = db.Column(db.String(120), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class TelemetrySegment(db.Model):
+    """One segment of a car's append-only telemetry log (see app.segment_store)"""
+    __table_args__ = (db.UniqueConstraint('car_id', 'base_offset'),)
+    id = db.Column(db.Integer, primary_key=True)
+    car_id = db.Column(db.String(80), nullable=False, index=True)
+    base_offset = db.Column(db.BigInteger, nullable=False)  # Offset of the segment's first record
+    next_offset = db.Column(db.BigInteger, nullable=False)  # Offset after the last committed record
+    size_bytes = db.Column(db.BigInteger, default=0, nullable=False)  # Committed length of the .log file
+    index_bytes = db.Column(db.Integer, default=0, nullable=False)  # Committed length of the .index file
+    closed = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TelemetryBatch(db.Model):
+    """Batch ids already appended to a car's telemetry log, so retries are not stored twice"""
+    __table_args__ = (db.UniqueConstraint('car_id', 'batch_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    car_id = db.Column(db.String(80), nullable=False)
+    batch_id = db.Column(db.String(64), nullable=False)
+    first_offset = db.Column(db.BigInteger, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class CarAuthCode(db.Model):
     """Temporary authorization codes for vehicles"""
+    __table_args__ = (
+        # Matches the /token lookup on (code, client_id, used)
+        db.Index('ix_car_auth_code_lookup', 'code', 'client_id', 'used'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(100), unique=True, nullable=False)
     client_id = db.Column(db.String(100), nullable=False)
     vin = db.Column(db.String(17), nullable=False)
     scope = db.Column(db.String(500))
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
     used = db.Column(db.Boolean, default=False)
     ip_address = db.Column(db.String(45))
+
+class RefreshToken(db.Model):
+    """Rotating refresh tokens; only the SHA-256 of each token is stored"""
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.LargeBinary(32), unique=True, nullable=False)
+    family_id = db.Column(db.String(32), nullable=False, index=True)  # Shared by every rotation of one grant
+    client_id = db.Column(db.String(100), nullable=False)
+    scope = db.Column(db.String(500))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    used = db.Column(db.Boolean, default=False, nullable=False)
+    revoked = db.Column(db.Boolean, default=False, nullable=False)
+
+class RevokedToken(db.Model):
+    """Deny-list of access tokens revoked before their exp; seq is the sync cursor"""
+    # Without AUTOINCREMENT, SQLite reuses the seq of purged rows and pollers skip new entries
+    __table_args__ = {'sqlite_autoincrement': True}
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    jti = db.Column(db.String(32), unique=True, nullable=False)
+    client_id = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # The token's exp; the row is useless after it
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,76 @@
+"""Refresh-token issue, rotation and reuse detection.
+
+Each refresh token is redeemable once. Redeeming it marks it used and issues
+its successor in the same family. Presenting an already-used token means it
+leaked, so the whole family is revoked and the legitimate holder has to
+authorize again.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from .models import db, RefreshToken, RevokedToken
+
+PURGE_BATCH_SIZE = 10000
+
+class RefreshTokenError(Exception):
+    pass
+
+def hash_refresh_token(token):
+    return hashlib.sha256(token.encode()).digest()
+
+def issue_refresh_token(client_id, scope, family_id=None):
+    """Add a new refresh token to the session and return its plaintext value"""
+    token = secrets.token_urlsafe(32)
+    db.session.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        client_id=client_id,
+        scope=scope,
+        expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['REFRESH_TOKEN_EXPIRES_IN'])
+    ))
+    return token
+
+def rotate_refresh_token(token, client_id):
+    """Redeem a refresh token, returning (scope, successor); the caller commits"""
+    record = RefreshToken.query.filter_by(token_hash=hash_refresh_token(token or '')).first()
+    if not record or record.client_id != client_id:
+        raise RefreshTokenError('Invalid refresh token')
+    if record.revoked:
+        raise RefreshTokenError('Refresh token revoked')
+
+    # Conditional update so two concurrent redemptions cannot both succeed
+    claimed = RefreshToken.query.filter_by(id=record.id, used=False, revoked=False).update(
+        {'used': True}, synchronize_session=False
+    )
+    if claimed != 1:
+        RefreshToken.query.filter_by(family_id=record.family_id).update(
+            {'revoked': True}, synchronize_session=False
+        )
+        db.session.commit()
+        current_app.logger.warning(f"Refresh token reuse for {client_id}; revoked family {record.family_id}")
+        raise RefreshTokenError('Refresh token reuse detected')
+
+    if record.expires_at < datetime.utcnow():
+        db.session.rollback()
+        raise RefreshTokenError('Refresh token expired')
+
+    return record.scope, issue_refresh_token(client_id, record.scope, record.family_id)
+
+def purge_expired_rows(model, key, now=None):
+    """Delete rows whose expires_at has passed in batches, returning how many were removed"""
+    now = now or datetime.utcnow()
+    removed = 0
+    while True:
+        batch = select(key).where(model.expires_at < now).limit(PURGE_BATCH_SIZE)
+        deleted = model.query.filter(key.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+        removed += deleted
+        if deleted < PURGE_BATCH_SIZE:
+            return removed
+
+def purge_expired_tokens(now=None):
+    """Delete expired refresh tokens and deny-list entries for already-expired access tokens"""
+    return purge_expired_rows(RefreshToken, RefreshToken.id, now) + \
+        purge_expired_rows(RevokedToken, RevokedToken.seq, now)
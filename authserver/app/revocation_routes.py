@@ -0,0 +1,110 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime
+import hmac
+from .models import db, RevokedToken, RefreshToken
+from .car_cache import get_car
+from .refresh_tokens import hash_refresh_token
+from .routes import has_provisioning_key
+from .utils import decode_car_access_token
+
+revocation_bp = Blueprint('revocation', __name__)
+
+# Largest page returned by /revocations
+REVOCATION_PAGE_SIZE = 1000
+
+def authenticated_car():
+    """The car whose client_id and client_secret are in the form, or None"""
+    car = get_car(request.form.get('client_id'))
+    secret = request.form.get('client_secret') or ''
+    if not car or not hmac.compare_digest(car.client_secret.encode(), secret.encode()):
+        return None
+    return car
+
+def caller_may_revoke(client_id):
+    """A car may revoke and introspect its own tokens; the provisioning key may act on any"""
+    if has_provisioning_key():
+        return True
+    car = authenticated_car()
+    return bool(car) and car.client_id == client_id
+
+@revocation_bp.route('/revoke', methods=['POST'])
+def revoke_token():
+    """Revoke an access token (by jti) or a refresh token family"""
+    token = request.form.get('token')
+    if not token:
+        return jsonify({'error': 'Missing token'}), 400
+
+    if request.form.get('token_type_hint') == 'refresh_token':
+        record = RefreshToken.query.filter_by(token_hash=hash_refresh_token(token)).first()
+        if record:
+            if not caller_may_revoke(record.client_id):
+                return jsonify({'error': 'Unauthorized'}), 401
+            RefreshToken.query.filter_by(family_id=record.family_id).update(
+                {'revoked': True}, synchronize_session=False
+            )
+            db.session.commit()
+        return jsonify({'revoked': bool(record)}), 200
+
+    payload = decode_car_access_token(token)
+    # Unknown, malformed and already-expired tokens need no entry (RFC 7009 answers 200)
+    if not payload or 'jti' not in payload:
+        return jsonify({'revoked': False}), 200
+    if not caller_may_revoke(payload['client_id']):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    if not RevokedToken.query.filter_by(jti=payload['jti']).first():
+        db.session.add(RevokedToken(
+            jti=payload['jti'],
+            client_id=payload['client_id'],
+            expires_at=datetime.utcfromtimestamp(payload['exp'])
+        ))
+        db.session.commit()
+    return jsonify({'revoked': True, 'jti': payload['jti']}), 200
+
+@revocation_bp.route('/introspect', methods=['POST'])
+def introspect_token():
+    """Report whether an access token is currently active, and its claims if so.
+
+    The caller must authenticate with the provisioning key or car credentials
+    (RFC 7662 section 2.1). A car only sees its own tokens as active.
+    """
+    if not has_provisioning_key() and not authenticated_car():
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    payload = decode_car_access_token(request.form.get('token', ''))
+    if not payload or not caller_may_revoke(payload['client_id']):
+        return jsonify({'active': False})
+    if 'jti' in payload and RevokedToken.query.filter_by(jti=payload['jti']).first():
+        return jsonify({'active': False})
+
+    return jsonify({
+        'active': True,
+        'client_id': payload['client_id'],
+        'vin': payload.get('vin'),
+        'scope': payload.get('scope'),
+        'exp': payload['exp'],
+        'iat': payload.get('iat'),
+        'jti': payload.get('jti'),
+        'token_type': 'Bearer'
+    })
+
+@revocation_bp.route('/revocations', methods=['GET'])
+def list_revocations():
+    """Revocations after the `since` cursor that are not yet expired, oldest first"""
+    since = request.args.get('since', 0, type=int)
+    rows = RevokedToken.query.filter(
+        RevokedToken.seq > since,
+        RevokedToken.expires_at > datetime.utcnow()
+    ).order_by(RevokedToken.seq).limit(REVOCATION_PAGE_SIZE + 1).all()
+
+    has_more = len(rows) > REVOCATION_PAGE_SIZE
+    rows = rows[:REVOCATION_PAGE_SIZE]
+    return jsonify({
+        'revocations': [
+            {'jti': row.jti, 'exp': int((row.expires_at - datetime(1970, 1, 1)).total_seconds())}
+            for row in rows
+        ],
+        # Expired rows are skipped, so the cursor never moves backwards past them
+        'cursor': rows[-1].seq if rows else max(since, db.session.query(db.func.max(RevokedToken.seq)).scalar() or 0),
+        'has_more': has_more
+    })
@@ -1,10 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from datetime import datetime, timedelta
-from .models import db, ConnectedCar, CarAuthCode
+import hmac
+import json
+from .models import db, ConnectedCar
+from .code_store import get_code_store
+from .car_cache import get_car, snapshot
+from .refresh_tokens import RefreshTokenError, issue_refresh_token, rotate_refresh_token
+from .signing_keys import get_signing_keys
 from .utils import (
     generate_car_auth_code,
     generate_car_access_token,
     verify_car_credentials,
+    allowed_car_scopes,
     validate_car_scope
 )
 
@@ -20,18 +27,18 @@ def authorize_car():
         scope = data.get('scope')
         
         # Find car in database
-        car = ConnectedCar.query.filter_by(client_id=client_id).first()
+        car = get_car(client_id)
         if not car or car.client_secret != client_secret:
             return jsonify({'error': 'Invalid car credentials'}), 401
 
         # Validate requested scope
-        if not validate_car_scope(scope, car.scopes):
+        if not validate_car_scope(scope, allowed_car_scopes(car)):
             return jsonify({'error': 'Invalid scope for this vehicle'}), 400
 
         
         # Generate authorization code
         auth_code = generate_car_auth_code()
-        new_code = CarAuthCode(
+        get_code_store().save(
             code=auth_code,
             client_id=client_id,
             vin=car.vin,
@@ -39,9 +46,6 @@ def authorize_car():
             expires_at=datetime.utcnow() + timedelta(minutes=10),
             ip_address=request.remote_addr
         )
-        
-        db.session.add(new_code)
-        db.session.commit()
 
         return jsonify({
             'code': auth_code,
@@ -51,52 +55,182 @@ def authorize_car():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def token_response(car, scope, refresh_token=None):
+    """Record the authorization and build the access-token response for a car"""
+    ConnectedCar.query.filter_by(client_id=car.client_id).update(
+        {'last_authorized': datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+
+    # Generate access token
+    access_token = generate_car_access_token(
+        client_id=car.client_id,
+        vin=car.vin,
+        scope=scope
+    )
+
+    response = {
+        'access_token': access_token,
+        'token_type': 'Bearer',
+        'expires_in': 3600,
+        'scope': scope,
+        'vehicle_info': {
+            'vin': car.vin,
+            'model': car.model,
+            'year': car.year
+        }
+    }
+    if refresh_token:
+        response['refresh_token'] = refresh_token
+        response['refresh_expires_in'] = current_app.config['REFRESH_TOKEN_EXPIRES_IN']
+    return jsonify(response)
+
 @auth_bp.route('/token', methods=['POST'])
 def car_token():
-    """Second step: Exchange auth code for access token"""
+    """Second step: Exchange auth code for access token, or issue one directly for client_credentials"""
     try:
-        code = request.form.get('code')
+        grant_type = request.form.get('grant_type', 'authorization_code')
         client_id = request.form.get('client_id')
         client_secret = request.form.get('client_secret')
 
-        # Verify car
-        car = ConnectedCar.query.filter_by(client_id=client_id).first()
+        if grant_type not in ('authorization_code', 'client_credentials', 'refresh_token'):
+            return jsonify({'error': 'Unsupported grant type'}), 400
+
+        # Verify car; every grant authenticates the client, refresh included (RFC 6749 section 6)
+        car = get_car(client_id)
         if not car or car.client_secret != client_secret:
             return jsonify({'error': 'Invalid car credentials'}), 401
 
-        # Verify authorization code
-        auth_code = CarAuthCode.query.filter_by(
-            code=code,
-            client_id=client_id,
-            used=False
-        ).first()
-
-        if not auth_code or auth_code.expires_at < datetime.utcnow():
-            return jsonify({'error': 'Invalid or expired code'}), 400
+        if grant_type == 'refresh_token':
+            return refresh_token_grant(car, request.form.get('refresh_token'))
 
-        # Mark code as used
-        auth_code.used = True
-        car.last_authorized = datetime.utcnow()
-        db.session.commit()
+        if grant_type == 'client_credentials':
+            # Headless vehicles skip /authorize; the scope is validated here instead
+            scope = request.form.get('scope')
+            if not validate_car_scope(scope, allowed_car_scopes(car)):
+                return jsonify({'error': 'Invalid scope for this vehicle'}), 400
+            return token_response(car, scope)
 
-        # Generate access token
-        access_token = generate_car_access_token(
-            client_id=client_id,
-            vin=car.vin,
-            scope=auth_code.scope
-        )
+        # Verify and redeem authorization code
+        auth_code = get_code_store().consume(request.form.get('code'), client_id)
+        if not auth_code:
+            return jsonify({'error': 'Invalid or expired code'}), 400
 
-        return jsonify({
-            'access_token': access_token,
-            'token_type': 'Bearer',
-            'expires_in': 3600,
-            'scope': auth_code.scope,
-            'vehicle_info': {
-                'vin': car.vin,
-                'model': car.model,
-                'year': car.year
-            }
-        })
+        refresh_token = issue_refresh_token(client_id, auth_code['scope'])
+        return token_response(car, auth_code['scope'], refresh_token)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def refresh_token_grant(car, refresh_token):
+    """Rotate an authenticated car's refresh token into a new access and refresh token pair"""
+    try:
+        scope, successor = rotate_refresh_token(refresh_token, car.client_id)
+    except RefreshTokenError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The car may have lost scopes since the grant
+    if not validate_car_scope(scope, allowed_car_scopes(car)):
+        db.session.rollback()
+        return jsonify({'error': 'Grant no longer valid for this vehicle'}), 400
+
+    return token_response(car, scope, successor)
+
+@auth_bp.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    """Public keys verifiers use to check access-token signatures, by kid"""
+    response = jsonify(get_signing_keys().jwks())
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['JWKS_MAX_AGE']}"
+    return response
+
+def has_provisioning_key():
+    """True if the request carries the configured fleet provisioning key"""
+    expected = current_app.config.get('PROVISIONING_KEY')
+    provided = request.headers.get('X-Provisioning-Key', '')
+    return bool(expected) and hmac.compare_digest(provided.encode(), expected.encode())
+
+@auth_bp.route('/token/batch', methods=['POST'])
+def car_token_batch():
+    """Issue tokens for many cars in one request, streaming one NDJSON line per entry"""
+    if not has_provisioning_key():
+        return jsonify({'error': 'Invalid provisioning key'}), 401
+
+    data = request.get_json(silent=True) or {}
+    entries = data.get('entries')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'entries must be a non-empty list'}), 400
+    if len(entries) > current_app.config['TOKEN_BATCH_MAX_ENTRIES']:
+        return jsonify({'error': 'Too many entries'}), 413
+
+    chunk_size = current_app.config['TOKEN_BATCH_CHUNK_SIZE']
+    expires_in = current_app.config['TOKEN_EXPIRES_IN']
+
+    def issue():
+        authorized = []
+        recorded = False
+        now = datetime.utcnow()
+
+        def record_authorized():
+            """Stamp last_authorized for every issued token in one short write transaction"""
+            nonlocal recorded
+            recorded = True
+            for start in range(0, len(authorized), chunk_size):
+                ConnectedCar.query.filter(ConnectedCar.client_id.in_(authorized[start:start + chunk_size])).update(
+                    {'last_authorized': now}, synchronize_session=False
+                )
+            db.session.commit()
+
+        try:
+            for start in range(0, len(entries), chunk_size):
+                chunk = entries[start:start + chunk_size]
+                client_ids = {
+                    entry.get('client_id') for entry in chunk
+                    if isinstance(entry, dict) and isinstance(entry.get('client_id'), str)
+                }
+                cars = {
+                    car.client_id: snapshot(car)
+                    for car in ConnectedCar.query.filter(ConnectedCar.client_id.in_(client_ids))
+                }
+                # End the read transaction so no SQLite lock is held while the client reads
+                db.session.rollback()
+
+                for index, entry in enumerate(chunk, start):
+                    result = {'index': index, 'success': False}
+                    if not isinstance(entry, dict):
+                        result['error'] = 'Entry must be an object'
+                        yield json.dumps(result) + '\n'
+                        continue
+
+                    client_id = entry.get('client_id')
+                    scope = entry.get('scope')
+                    result['client_id'] = client_id
+                    car = cars.get(client_id) if isinstance(client_id, str) else None
+                    if not car or car.client_secret != entry.get('client_secret'):
+                        result['error'] = 'Invalid car credentials'
+                    elif not validate_car_scope(scope, allowed_car_scopes(car)):
+                        result['error'] = 'Invalid scope for this vehicle'
+                    else:
+                        result.update({
+                            'success': True,
+                            'access_token': generate_car_access_token(client_id=client_id, vin=car.vin, scope=scope),
+                            'token_type': 'Bearer',
+                            'expires_in': expires_in,
+                            'scope': scope
+                        })
+                        authorized.append(client_id)
+                    yield json.dumps(result) + '\n'
+
+            record_authorized()
+            yield json.dumps({'summary': True, 'entries': len(entries), 'issued': len(authorized)}) + '\n'
+        except Exception as e:
+            db.session.rollback()
+            yield json.dumps({'summary': True, 'error': str(e)}) + '\n'
+        finally:
+            # Tokens already streamed are recorded even if the client disconnected partway
+            if not recorded and authorized:
+                try:
+                    record_authorized()
+                except Exception:
+                    db.session.rollback()
+
+    return Response(stream_with_context(issue()), mimetype='application/x-ndjson')
@@ -0,0 +1,66 @@
+"""Scopes and scope categories compiled to integer bitmasks.
+
+Every scope in Config.ALLOWED_SCOPES gets a fixed bit position, in list order,
+when this module is imported. A set of scopes is then a single integer, and
+scope checks become AND/OR operations instead of building Python sets.
+Scopes without a category, such as file_upload and file_download, are
+never valid in an authorization request.
+"""
+from functools import lru_cache
+from config import Config
+
+SCOPE_CATEGORIES = {
+    'basic_operations': ['engine_start', 'engine_stop', 'door_lock', 'door_unlock', 'trunk_access', 'horn_control', 'light_control'],
+    'climate': ['climate_control', 'temperature_set', 'ac_control', 'heater_control', 'defrost_control', 'fan_control'],
+    'vehicle_status': ['battery_status', 'fuel_status', 'tire_pressure', 'oil_status', 'diagnostic_basic', 'diagnostic_full'],
+    'location': ['location_access', 'location_history', 'geofence_set', 'route_planning', 'navigation_control'],
+    'connectivity': ['ota_update', 'wifi_control', 'bluetooth_control', 'mobile_app_sync'],
+    'safety': ['alarm_control', 'emergency_call', 'crash_detection', 'theft_alert', 'valet_mode'],
+    'driver_assistance': ['parking_assist', 'lane_control', 'cruise_control', 'speed_limit', 'driver_assist_settings'],
+    'entertainment': ['media_control', 'audio_settings', 'display_settings', 'passenger_entertainment'],
+    'preferences': ['seat_control', 'mirror_control', 'profile_management', 'driving_mode'],
+    'maintenance': ['service_schedule', 'maintenance_history', 'repair_status', 'recall_info'],
+    'data': ['telemetry_basic', 'telemetry_advanced', 'usage_statistics', 'efficiency_metrics']
+}
+
+# Bit positions are part of the stored ConnectedCar.scope_mask, so new
+# scopes must be appended to Config.ALLOWED_SCOPES, never inserted.
+SCOPE_BITS = {scope: 1 << bit for bit, scope in enumerate(dict.fromkeys(Config.ALLOWED_SCOPES))}
+if len(SCOPE_BITS) > 63:
+    raise ValueError("ALLOWED_SCOPES no longer fits in a 64-bit scope_mask column")
+
+SCOPE_CATEGORY = {scope: category for category, scopes in SCOPE_CATEGORIES.items() for scope in scopes}
+CATEGORY_MASKS = {
+    category: sum(SCOPE_BITS[scope] for scope in scopes if scope in SCOPE_BITS)
+    for category, scopes in SCOPE_CATEGORIES.items()
+}
+CATEGORIZED_MASK = sum(CATEGORY_MASKS.values())
+
+@lru_cache(maxsize=4096)
+def compile_scope(scope_string):
+    """Bitmask for a space-separated scope string, or None if it names an unknown scope"""
+    mask = 0
+    for scope in (scope_string or '').split():
+        bit = SCOPE_BITS.get(scope)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+@lru_cache(maxsize=4096)
+def allowed_mask(scope_string):
+    """Bitmask of a car's allowed scopes; names outside ALLOWED_SCOPES grant nothing"""
+    mask = 0
+    for scope in (scope_string or '').split():
+        mask |= SCOPE_BITS.get(scope, 0)
+    return mask
+
+def scopes_from_mask(mask):
+    return ' '.join(scope for scope, bit in SCOPE_BITS.items() if mask & bit)
+
+def categories_from_mask(mask):
+    return [category for category, category_mask in CATEGORY_MASKS.items() if mask & category_mask]
+
+def sync_scope_mask(mapper, connection, car):
+    """Keep ConnectedCar.scope_mask in step with its scopes string"""
+    car.scope_mask = allowed_mask(car.scopes)
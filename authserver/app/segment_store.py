@@ -0,0 +1,234 @@
+"""Segmented append-only log for raw telemetry.
+
+Each car has its own log under TELEMETRY_SEGMENT_DIR/<car_id>/. Records are
+NDJSON lines numbered per car from offset 0. The log is split into segments
+named after the offset of their first record (<base>.log). A segment is
+closed once it reaches TELEMETRY_SEGMENT_MAX_BYTES or has been open for
+TELEMETRY_SEGMENT_MAX_AGE seconds, checked on the next append. With
+TELEMETRY_SEGMENT_COMPRESS, closed segments are then gzipped in the
+background.
+
+Every segment has a sparse offset index (<base>.index) with one entry per
+TELEMETRY_INDEX_INTERVAL bytes of records, so a range read seeks close to
+its first record instead of scanning the segment. A compressed segment
+(<base>.log.gz) is written as one gzip member per index block, and its
+<base>.gzindex lets the same seek work on it.
+
+A batch of records is appended to the active segment and its index and
+fsynced, then recorded with a single commit on the segment's TelemetrySegment
+row. Bytes past the committed sizes come from a batch that failed before its
+commit, and are truncated before the next append, so a batch is stored
+entirely or not at all. Appends to one car's log are serialised by a per-car
+lock. Like MemoryCodeStore, this assumes a single auth server process.
+"""
+import bisect
+import gzip
+import os
+import re
+import struct
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from .models import db, TelemetrySegment, TelemetryBatch
+
+# Record offset relative to the segment base, byte position in the segment file
+INDEX_ENTRY = struct.Struct('>IQ')
+CAR_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,80}$')
+
+def read_index(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [INDEX_ENTRY.unpack_from(data, i) for i in range(0, len(data) - len(data) % INDEX_ENTRY.size, INDEX_ENTRY.size)]
+
+class SegmentStore:
+    def __init__(self, root, max_segment_bytes=64 * 1024 * 1024, max_segment_age=3600,
+                 index_interval=4096, compress=True):
+        self.root = root
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.index_interval = index_interval
+        self.compress = compress
+        self._car_locks = {}
+        self._lock = threading.Lock()
+
+    def _car_lock(self, car_id):
+        with self._lock:
+            return self._car_locks.setdefault(car_id, threading.Lock())
+
+    def _path(self, car_id, base_offset, suffix):
+        if not CAR_ID_PATTERN.match(car_id):
+            raise ValueError(f"Invalid car_id for the telemetry log: {car_id!r}")
+        return os.path.join(self.root, car_id, f"{base_offset:020d}{suffix}")
+
+    def next_offset(self, car_id):
+        """Offset the next record appended for this car will get"""
+        last = TelemetrySegment.query.filter_by(car_id=car_id).order_by(TelemetrySegment.base_offset.desc()).first()
+        return last.next_offset if last else 0
+
+    def append(self, car_id, lines, batch_id=None):
+        """Append NDJSON lines (bytes ending in a newline) as one batch.
+
+        Returns (first_offset, stored). With a batch_id that was already
+        appended, nothing is written and the original batch's first offset is
+        returned with stored=False.
+        """
+        with self._car_lock(car_id):
+            if batch_id is not None:
+                previous = TelemetryBatch.query.filter_by(car_id=car_id, batch_id=batch_id).first()
+                if previous:
+                    return previous.first_offset, False
+
+            segment = self._writable_segment(car_id)
+            first_offset = segment.next_offset
+            if lines:
+                self._write(car_id, segment, lines)
+            if batch_id is not None:
+                db.session.add(TelemetryBatch(
+                    car_id=car_id,
+                    batch_id=batch_id,
+                    first_offset=first_offset,
+                    record_count=len(lines)
+                ))
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return first_offset, True
+
+    def _writable_segment(self, car_id):
+        segment = TelemetrySegment.query.filter_by(car_id=car_id, closed=False).first()
+        if segment and segment.size_bytes > 0 and (
+            segment.size_bytes >= self.max_segment_bytes or
+            datetime.utcnow() - segment.created_at >= timedelta(seconds=self.max_segment_age)
+        ):
+            segment.closed = True
+            db.session.commit()
+            if self.compress:
+                threading.Thread(
+                    target=self.compress_segment, args=(car_id, segment.base_offset, segment.size_bytes), daemon=True
+                ).start()
+            segment = None
+
+        if segment is None:
+            base_offset = self.next_offset(car_id)
+            segment = TelemetrySegment(car_id=car_id, base_offset=base_offset, next_offset=base_offset,
+                                       size_bytes=0, index_bytes=0, created_at=datetime.utcnow())
+            db.session.add(segment)
+        return segment
+
+    def _write(self, car_id, segment, lines):
+        """Write a batch to the segment files and advance the (uncommitted) segment row"""
+        log_path = self._path(car_id, segment.base_offset, '.log')
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+        with open(log_path, 'ab') as log, open(self._path(car_id, segment.base_offset, '.index'), 'ab') as index:
+            # Drop whatever a failed batch left past the last commit
+            log.truncate(segment.size_bytes)
+            index.truncate(segment.index_bytes)
+
+            last_indexed = None
+            if segment.index_bytes:
+                with open(index.name, 'rb') as f:
+                    f.seek(segment.index_bytes - INDEX_ENTRY.size)
+                    last_indexed = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))[1]
+
+            position = segment.size_bytes
+            relative = segment.next_offset - segment.base_offset
+            entries = []
+            for line in lines:
+                if last_indexed is None or position - last_indexed >= self.index_interval:
+                    entries.append(INDEX_ENTRY.pack(relative, position))
+                    last_indexed = position
+                position += len(line)
+                relative += 1
+
+            log.write(b''.join(lines))
+            index.write(b''.join(entries))
+            for f in (log, index):
+                f.flush()
+                os.fsync(f.fileno())
+
+        segment.size_bytes = position
+        segment.index_bytes += len(entries) * INDEX_ENTRY.size
+        segment.next_offset += len(lines)
+
+    def compress_segment(self, car_id, base_offset, size_bytes):
+        """Gzip a closed segment one index block per member, then remove the plain files"""
+        log_path = self._path(car_id, base_offset, '.log')
+        index_path = self._path(car_id, base_offset, '.index')
+        gz_path = self._path(car_id, base_offset, '.log.gz')
+        gzindex_path = self._path(car_id, base_offset, '.gzindex')
+        try:
+            # Entries at or past size_bytes were written by a batch that never committed
+            entries = [entry for entry in read_index(index_path) if entry[1] < size_bytes]
+            boundaries = [position for _, position in entries] + [size_bytes]
+            compressed_entries = []
+            with open(log_path, 'rb') as log, open(gz_path + '.tmp', 'wb') as out:
+                for (relative, position), end in zip(entries, boundaries[1:]):
+                    compressed_entries.append(INDEX_ENTRY.pack(relative, out.tell()))
+                    log.seek(position)
+                    out.write(gzip.compress(log.read(end - position)))
+                out.flush()
+                os.fsync(out.fileno())
+            with open(gzindex_path + '.tmp', 'wb') as out:
+                out.write(b''.join(compressed_entries))
+
+            # The index goes first: readers only switch to a segment once its .log.gz exists
+            os.replace(gzindex_path + '.tmp', gzindex_path)
+            os.replace(gz_path + '.tmp', gz_path)
+            os.remove(log_path)
+            os.remove(index_path)
+        except OSError as e:
+            # The plain segment stays readable; compression can be retried later
+            print(f"Compressing telemetry segment {log_path} failed: {str(e)}")
+
+    def _open_segment(self, car_id, base_offset):
+        """Open a segment as (file, index entries, compressed), preferring its gzipped form"""
+        gz_path = self._path(car_id, base_offset, '.log.gz')
+        for _ in range(2):
+            try:
+                if os.path.exists(gz_path):
+                    return open(gz_path, 'rb'), read_index(self._path(car_id, base_offset, '.gzindex')), True
+                entries = read_index(self._path(car_id, base_offset, '.index'))
+                return open(self._path(car_id, base_offset, '.log'), 'rb'), entries, False
+            except FileNotFoundError:
+                # Compression finished between the exists() check and the open
+                continue
+        raise FileNotFoundError(gz_path)
+
+    def read(self, car_id, start, end):
+        """Yield the committed records with start <= offset < end, in order, as NDJSON lines"""
+        segments = [
+            (segment.base_offset, segment.next_offset)
+            for segment in TelemetrySegment.query.filter(
+                TelemetrySegment.car_id == car_id,
+                TelemetrySegment.next_offset > TelemetrySegment.base_offset,
+                TelemetrySegment.next_offset > start,
+                TelemetrySegment.base_offset < end
+            ).order_by(TelemetrySegment.base_offset)
+        ]
+
+        def records():
+            for base_offset, next_offset in segments:
+                stop = min(end, next_offset)
+                f, entries, compressed = self._open_segment(car_id, base_offset)
+                with f:
+                    # Seek to the last index entry at or before the first wanted record
+                    i = max(0, bisect.bisect_right([relative for relative, _ in entries], start - base_offset) - 1)
+                    relative, position = entries[i] if entries else (0, 0)
+                    f.seek(position)
+                    stream = gzip.GzipFile(fileobj=f) if compressed else f
+                    offset = base_offset + relative
+                    # Lines past next_offset belong to a batch that is not committed yet
+                    for line in stream:
+                        if offset >= stop:
+                            break
+                        if offset >= start:
+                            yield line
+                        offset += 1
+
+        return records()
+
+def get_segment_store():
+    return current_app.extensions['segment_store']
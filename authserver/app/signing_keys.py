@@ -0,0 +1,126 @@
+"""Asymmetric signing keys for access tokens.
+
+Private keys live as PEM files in Config.JWT_KEY_DIR, one per key, named
+<kid>.pem. Tokens are signed with the active key and carry its kid in the
+header. Every key in the directory is published at /.well-known/jwks.json,
+so verifiers only need the public half and can pick the right key by kid.
+
+To rotate, add a new key (rotate_signing_key.py) and restart: the newest
+key becomes active while older ones stay published until their PEM files are
+deleted, so tokens signed before the rotation keep verifying until they
+expire. With JWT_ALGORITHM=HS256 tokens are signed with SECRET_KEY as before
+and the JWKS is empty. The other verifiers only accept HS256 tokens when
+JWT_ACCEPT_HS256=1, because anyone who knows the secret can forge them.
+"""
+import json
+import os
+from datetime import datetime
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from flask import current_app
+
+SUPPORTED_ALGORITHMS = ('ES256', 'EdDSA')
+
+# Key id of tokens signed with the shared secret
+LEGACY_KID = 'car-auth-key-1'
+
+def generate_private_key(algorithm):
+    if algorithm == 'ES256':
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == 'EdDSA':
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported JWT_ALGORITHM: {algorithm}")
+
+def key_algorithm(private_key):
+    if isinstance(private_key, ec.EllipticCurvePrivateKey) and private_key.curve.name == 'secp256r1':
+        return 'ES256'
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return 'EdDSA'
+    raise ValueError(f"Unsupported signing key type: {type(private_key).__name__}")
+
+def public_jwk(kid, algorithm, public_key):
+    """JWK for a public key, with kid, alg and use set"""
+    jwk_class = jwt.algorithms.ECAlgorithm if algorithm == 'ES256' else jwt.algorithms.OKPAlgorithm
+    jwk = json.loads(jwk_class.to_jwk(public_key))
+    jwk.update({'kid': kid, 'alg': algorithm, 'use': 'sig'})
+    return jwk
+
+def write_signing_key(key_dir, algorithm):
+    """Generate a key, save it as <kid>.pem readable only by the owner, and return its kid"""
+    os.makedirs(key_dir, exist_ok=True)
+    kid = f"{algorithm.lower()}-{datetime.utcnow():%Y%m%dT%H%M%S%f}"
+    pem = generate_private_key(algorithm).private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    fd = os.open(os.path.join(key_dir, f"{kid}.pem"), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pem)
+    return kid
+
+class SigningKeyRing:
+    def __init__(self, key_dir, algorithm='ES256', active_kid=None, secret_key=None, accept_hs256=False):
+        self.algorithm = algorithm
+        self.secret_key = secret_key
+        self.accept_hs256 = accept_hs256 or algorithm == 'HS256'
+        self.keys = {}  # kid -> (algorithm, private key)
+        self.active_kid = LEGACY_KID
+
+        if algorithm == 'HS256':
+            return
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            raise ValueError(f"Unsupported JWT_ALGORITHM: {algorithm}")
+
+        self.load(key_dir)
+        if not any(alg == algorithm for alg, _ in self.keys.values()):
+            write_signing_key(key_dir, algorithm)
+            self.load(key_dir)
+
+        if active_kid:
+            if active_kid not in self.keys:
+                raise ValueError(f"JWT_ACTIVE_KID {active_kid} not found in {key_dir}")
+            self.active_kid = active_kid
+        else:
+            # kids embed their creation time, so the newest sorts last
+            self.active_kid = max(kid for kid, (alg, _) in self.keys.items() if alg == algorithm)
+
+    def load(self, key_dir):
+        for name in sorted(os.listdir(key_dir)) if os.path.isdir(key_dir) else []:
+            if not name.endswith('.pem'):
+                continue
+            with open(os.path.join(key_dir, name), 'rb') as f:
+                private_key = serialization.load_pem_private_key(f.read(), password=None)
+            self.keys[name[:-len('.pem')]] = (key_algorithm(private_key), private_key)
+
+    def sign(self, payload):
+        headers = {'kid': self.active_kid, 'typ': 'JWT'}
+        if self.algorithm == 'HS256':
+            return jwt.encode(payload, self.secret_key, algorithm='HS256', headers=headers)
+        algorithm, private_key = self.keys[self.active_kid]
+        return jwt.encode(payload, private_key, algorithm=algorithm, headers=headers)
+
+    def verify(self, token):
+        """Decode a token with the key its kid names; raises jwt.InvalidTokenError"""
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') == 'HS256':
+            # Tokens issued before the switch to asymmetric keys
+            if not (self.accept_hs256 and self.secret_key):
+                raise jwt.InvalidTokenError("HS256 tokens are not accepted")
+            return jwt.decode(token, self.secret_key, algorithms=['HS256'])
+
+        entry = self.keys.get(header.get('kid'))
+        if entry is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {header.get('kid')}")
+        algorithm, private_key = entry
+        return jwt.decode(token, private_key.public_key(), algorithms=[algorithm])
+
+    def jwks(self):
+        return {'keys': [
+            public_jwk(kid, algorithm, private_key.public_key())
+            for kid, (algorithm, private_key) in self.keys.items()
+        ]}
+
+def get_signing_keys():
+    return current_app.extensions['signing_keys']
@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, request, jsonify, current_app, send_from_directory, stream_with_context
 import os
+import re
+import gzip
+import json
+import zlib
 from datetime import datetime
-from .models import db, TelemetryFile
+from .models import TelemetryFile
+from .segment_store import CAR_ID_PATTERN, get_segment_store
 from .utils import verify_car_credentials
 
 telemetry_bp = Blueprint('telemetry', __name__)
@@ -9,6 +14,14 @@ telemetry_bp = Blueprint('telemetry', __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploaded_files')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# /ingest commits every INGEST_BATCH_RECORDS records. Batch ids get a
+# ':<chunk>' suffix for each commit, so they are limited to 48 characters.
+INGEST_BATCH_RECORDS = 1000
+INGEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,48}$')
+INGEST_MARKER = '_batch'
+MAX_RECORD_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 100
+
 @telemetry_bp.route('/upload-text', methods=['POST'])
 def upload_text():
     data = request.get_json(force=True)
@@ -16,27 +29,143 @@ def upload_text():
     text = data.get('text')
     token = request.headers.get('Authorization')
 
-    if not car_id or text is None:
+    if not isinstance(car_id, str) or not CAR_ID_PATTERN.match(car_id) or text is None:
         return jsonify({'error': 'Missing parameters'}), 400
 
     if not verify_car_credentials(car_id, token):
         return jsonify({'error': 'Unauthorized'}), 403
 
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    filename = f"{car_id}_{timestamp}.txt"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    record = {'text': text, 'recorded_at': datetime.utcnow().isoformat()}
+    try:
+        offset, _ = get_segment_store().append(car_id, [json.dumps(record).encode('utf-8') + b'\n'])
+    except Exception as e:
+        return jsonify({'error': f'Failed to save record: {str(e)}'}), 500
+
+    return jsonify({'message': 'Record saved', 'offset': offset}), 201
+
+@telemetry_bp.route('/ingest', methods=['POST'])
+def ingest():
+    """Stream an NDJSON body, optionally gzip-compressed, into the car's telemetry log.
+
+    The body is decompressed and parsed one line at a time, so its size is
+    not limited by memory. Valid records are appended in batches of
+    INGEST_BATCH_RECORDS, with one commit per batch. Invalid lines are
+    skipped and reported by line number. X-Batch-Id, or a {"_batch": "<id>"}
+    line that starts a new batch, makes a retried upload idempotent: batches
+    that were already stored are acknowledged as duplicates instead of being
+    appended again.
+    """
+    car_id = request.args.get('car_id')
+    batch_id = request.headers.get('X-Batch-Id')
+    token = request.headers.get('Authorization')
+
+    if not car_id or not CAR_ID_PATTERN.match(car_id) or (batch_id is not None and not INGEST_ID_PATTERN.match(batch_id)):
+        return jsonify({'error': 'Missing parameters'}), 400
+
+    if not verify_car_credentials(car_id, token):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    encoding = request.headers.get('Content-Encoding', 'identity')
+    if encoding not in ('gzip', 'identity'):
+        return jsonify({'error': f'Unsupported Content-Encoding: {encoding}'}), 415
+    stream = gzip.GzipFile(fileobj=request.stream) if encoding == 'gzip' else request.stream
+
+    store = get_segment_store()
+    report = {'accepted': 0, 'duplicates': 0, 'rejected': 0, 'errors': [], 'batches': []}
+    pending = []
+    chunk = 0
 
+    def reject(line_number, error):
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_number, 'error': error})
+
+    def commit():
+        nonlocal pending, chunk
+        if not pending:
+            return
+        first_offset, stored = store.append(car_id, pending, batch_id=f"{batch_id}:{chunk}" if batch_id else None)
+        report['batches'].append({
+            'batch_id': batch_id,
+            'first_offset': first_offset,
+            'records': len(pending),
+            'duplicate': not stored
+        })
+        # A retried batch is acknowledged but its records were stored by the first upload
+        report['accepted' if stored else 'duplicates'] += len(pending)
+        pending = []
+        chunk += 1
+
+    line_number = 0
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(text)
+        while True:
+            line = stream.readline(MAX_RECORD_BYTES + 1)
+            if not line:
+                break
+            line_number += 1
+            if len(line) > MAX_RECORD_BYTES:
+                # Skip the rest of the oversized line
+                while line and not line.endswith(b'\n'):
+                    line = stream.readline(MAX_RECORD_BYTES + 1)
+                reject(line_number, 'Record too large')
+                continue
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                reject(line_number, 'Malformed JSON')
+                continue
+
+            if isinstance(record, dict) and list(record) == [INGEST_MARKER]:
+                if not isinstance(record[INGEST_MARKER], str) or not INGEST_ID_PATTERN.match(record[INGEST_MARKER]):
+                    # Records up to the next valid marker would lose their idempotency key
+                    report['error'] = f'Invalid batch id on line {line_number}'
+                    return jsonify(report), 400
+                commit()
+                batch_id, chunk = record[INGEST_MARKER], 0
+                continue
+
+            if not isinstance(record, dict) or not isinstance(record.get('text'), str):
+                reject(line_number, 'Every record needs a text field')
+                continue
+
+            pending.append(json.dumps(record).encode('utf-8') + b'\n')
+            if len(pending) >= INGEST_BATCH_RECORDS:
+                commit()
+        commit()
+    except (OSError, EOFError, zlib.error):
+        # Records after the last commit are dropped: a retry re-sends them under the same batch ids
+        report['error'] = f'Malformed or truncated body after line {line_number}'
+        return jsonify(report), 400
     except Exception as e:
-        return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
+        report['error'] = f'Failed to save records: {str(e)}'
+        return jsonify(report), 500
+
+    return jsonify(report), 200
 
-    file_entry = TelemetryFile(car_id=car_id, filename=filename)
-    db.session.add(file_entry)
-    db.session.commit()
+@telemetry_bp.route('/records', methods=['GET'])
+def read_records():
+    """Stream the records with offsets in [start, start + limit) from a car's log as NDJSON"""
+    car_id = request.args.get('car_id')
+    start = request.args.get('start', 0, type=int)
+    limit = request.args.get('limit', 1000, type=int)
+    token = request.headers.get('Authorization')
+
+    if not car_id or not CAR_ID_PATTERN.match(car_id) or not token or start < 0 or limit < 1:
+        return jsonify({'error': 'Missing parameters'}), 400
+
+    if not verify_car_credentials(car_id, token):
+        return jsonify({'error': 'Unauthorized'}), 403
 
-    return jsonify({'message': 'File saved', 'filename': filename}), 201
+    store = get_segment_store()
+    end = min(start + min(limit, current_app.config['TELEMETRY_READ_MAX_RECORDS']), store.next_offset(car_id))
+    response = Response(stream_with_context(store.read(car_id, start, end)), mimetype='application/x-ndjson')
+    response.headers['X-First-Offset'] = str(start)
+    # Where the next call should start; equal to X-First-Offset once the log is exhausted
+    response.headers['X-Next-Offset'] = str(max(start, end))
+    return response
 
 @telemetry_bp.route('/download/<path:filename>', methods=['GET'])
 def download_file(filename):
@@ -1,27 +1,25 @@
 import jwt
 from datetime import datetime, timedelta
 import secrets
-from flask import current_app
+from .scopes import SCOPE_CATEGORY, CATEGORIZED_MASK, compile_scope, allowed_mask
+from .signing_keys import get_signing_keys
 
 def generate_car_auth_code():
     """Generate secure authorization code"""
     return secrets.token_urlsafe(32)
 
 def generate_car_access_token(client_id, vin, scope):
-    """Generate JWT token with car-specific claims"""
-    headers = {
-        'kid': 'car-auth-key-1',  # Key identifier for the signing key
-        'typ': 'JWT'
-    }
+    """Generate JWT token with car-specific claims, signed with the active key"""
     payload = {
         'client_id': client_id,
         'vin': vin,
         'scope': scope,
         'exp': datetime.utcnow() + timedelta(hours=1),
         'iat': datetime.utcnow(),
+        'jti': secrets.token_hex(16),  # Lets the token be revoked before exp
         'token_type': 'car_access'
     }
-    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256', headers=headers)
+    return get_signing_keys().sign(payload)
 
 def verify_car_credentials(vin, scope):
     """Verify car credentials and requested scope"""
@@ -34,39 +32,29 @@ def verify_car_credentials(vin, scope):
 
 def get_scope_category(scope):
     """Get the category of a specific scope"""
-    categories = {
-        'basic_operations': ['engine_start', 'engine_stop', 'door_lock', 'door_unlock', 'trunk_access', 'horn_control', 'light_control'],
-        'climate': ['climate_control', 'temperature_set', 'ac_control', 'heater_control', 'defrost_control', 'fan_control'],
-        'vehicle_status': ['battery_status', 'fuel_status', 'tire_pressure', 'oil_status', 'diagnostic_basic', 'diagnostic_full'],
-        'location': ['location_access', 'location_history', 'geofence_set', 'route_planning', 'navigation_control'],
-        'connectivity': ['ota_update', 'wifi_control', 'bluetooth_control', 'mobile_app_sync'],
-        'safety': ['alarm_control', 'emergency_call', 'crash_detection', 'theft_alert', 'valet_mode'],
-        'driver_assistance': ['parking_assist', 'lane_control', 'cruise_control', 'speed_limit', 'driver_assist_settings'],
-        'entertainment': ['media_control', 'audio_settings', 'display_settings', 'passenger_entertainment'],
-        'preferences': ['seat_control', 'mirror_control', 'profile_management', 'driving_mode'],
-        'maintenance': ['service_schedule', 'maintenance_history', 'repair_status', 'recall_info'],
-        'data': ['telemetry_basic', 'telemetry_advanced', 'usage_statistics', 'efficiency_metrics']
-    }
-    
-    for category, scopes in categories.items():
-        if scope in scopes:
-            return category
-    return None
+    return SCOPE_CATEGORY.get(scope)
+
+def allowed_car_scopes(car):
+    """A car's scope_mask for validate_car_scope, or its scopes string on rows not yet backfilled"""
+    return car.scope_mask if car.scope_mask is not None else car.scopes
 
 def validate_car_scope(requested_scope, allowed_scopes):
-    """Enhanced validation of requested scopes against allowed scopes"""
-    if not requested_scope or not allowed_scopes:
-        return False
-        
-    requested = set(requested_scope.split())
-    allowed = set(allowed_scopes.split())
-    
-    # Check if all requested scopes are allowed
-    if not requested.issubset(allowed):
+    """Enhanced validation of requested scopes against allowed scopes.
+
+    allowed_scopes is either the car's scope string or its precomputed
+    scope_mask. Every requested scope must be allowed and belong to a category.
+    """
+    requested = compile_scope(requested_scope)
+    if not requested:
         return False
-        
-    # Additional validation for scope categories
-    requested_categories = {get_scope_category(scope) for scope in requested}
-    allowed_categories = {get_scope_category(scope) for scope in allowed}
-    
-    return None not in requested_categories and requested_categories.issubset(allowed_categories)
+
+    allowed = allowed_scopes if isinstance(allowed_scopes, int) else allowed_mask(allowed_scopes)
+    return requested & ~allowed == 0 and requested & ~CATEGORIZED_MASK == 0
+
+def decode_car_access_token(token):
+    """Verify an access token's signature and expiry, returning its claims or None"""
+    try:
+        payload = get_signing_keys().verify(token)
+    except jwt.InvalidTokenError:
+        return None
+    return payload if payload.get('token_type') == 'car_access' else None
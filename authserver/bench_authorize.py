@@ -0,0 +1,92 @@
+"""Throughput benchmark for /authorize with and without the car credential cache.
+
+Seeds a throwaway SQLite database with --cars vehicles and replays /authorize
+through the Flask test client. Each round runs a valid-car mix and an
+unknown-client_id mix, first with the cache and then with it removed. Codes
+go to the in-memory code store, so the numbers isolate the credential
+lookup rather than the code INSERT.
+
+Usage:
+    python bench_authorize.py --cars 1000 --requests 5000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+db_dir = tempfile.mkdtemp()
+os.environ.setdefault('SECRET_KEY', 'bench-secret-key-for-authorize-only')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+os.environ['AUTH_CODE_STORE'] = 'memory'
+os.environ['AUTH_CODE_PURGE_INTERVAL'] = '0'
+
+from app import create_app
+from app.models import db, ConnectedCar
+from app.car_cache import CarCache
+
+SCOPES = 'engine_start door_unlock'
+
+def seed(app, cars):
+    with app.app_context():
+        db.session.add_all([
+            ConnectedCar(
+                client_id=f'bench_car_{i}',
+                client_secret=f'bench_secret_{i}',
+                vin=f'BENCH{i:012d}',
+                model='Bench Model',
+                year=2025,
+                scopes=SCOPES
+            )
+            for i in range(cars)
+        ])
+        db.session.commit()
+
+def run(client, payloads, expected_status):
+    start = time.perf_counter()
+    for payload in payloads:
+        response = client.post('/authorize', json=payload)
+        assert response.status_code == expected_status, response.get_json()
+    elapsed = time.perf_counter() - start
+    return round(len(payloads) / elapsed, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /authorize credential lookups")
+    parser.add_argument('--cars', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--hot-cars', type=int, default=100, help="distinct cars in the valid mix")
+    args = parser.parse_args()
+
+    app = create_app()
+    seed(app, args.cars)
+    client = app.test_client()
+    rng = random.Random(7)
+
+    valid = [
+        {'client_id': f'bench_car_{i}', 'client_secret': f'bench_secret_{i}', 'scope': SCOPES}
+        for i in (rng.randrange(min(args.hot_cars, args.cars)) for _ in range(args.requests))
+    ]
+    unknown = [
+        {'client_id': f'guess_{rng.randrange(50)}', 'client_secret': 'x', 'scope': SCOPES}
+        for _ in range(args.requests)
+    ]
+
+    cache = app.extensions['car_cache'] or CarCache()
+    results = {}
+    for label, enabled in (('cached', True), ('uncached', False)):
+        app.extensions['car_cache'] = cache if enabled else None
+        cache.invalidate()
+        results[label] = {
+            'valid_rps': run(client, valid, 200),
+            'unknown_client_rps': run(client, unknown, 401)
+        }
+    results['cache_stats'] = cache.stats
+    results['speedup_valid'] = round(results['cached']['valid_rps'] / results['uncached']['valid_rps'], 2)
+    results['speedup_unknown'] = round(
+        results['cached']['unknown_client_rps'] / results['uncached']['unknown_client_rps'], 2
+    )
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,33 @@ class Config:
     # OAuth Configuration
     TOKEN_EXPIRES_IN = 3600  # Access token expiry (1 hour)
     AUTH_CODE_EXPIRES_IN = 600  # Authorization code expiry (10 minutes)
+    REFRESH_TOKEN_EXPIRES_IN = 30 * 24 * 3600  # Refresh token expiry (30 days), renewed on rotation
+    JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'ES256')  # 'ES256', 'EdDSA', or 'HS256' to sign with SECRET_KEY
+    JWT_KEY_DIR = os.getenv('JWT_KEY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keys'))
+    JWT_ACTIVE_KID = os.getenv('JWT_ACTIVE_KID')  # Defaults to the newest key in JWT_KEY_DIR
+    JWT_ACCEPT_HS256 = os.getenv('JWT_ACCEPT_HS256', '0') == '1'  # Opt-in: also verify tokens signed with SECRET_KEY
+    JWKS_MAX_AGE = 300  # Seconds verifiers may cache /.well-known/jwks.json
+    AUTH_CODE_STORE = os.getenv('AUTH_CODE_STORE', 'sql')  # 'sql' or 'memory' (single process only)
+    AUTH_CODE_PURGE_INTERVAL = int(os.getenv('AUTH_CODE_PURGE_INTERVAL', '300'))  # Seconds, 0 disables
+    
+    # Fleet provisioning (/token/batch); the endpoint is disabled without a key
+    PROVISIONING_KEY = os.getenv('PROVISIONING_KEY')
+    TOKEN_BATCH_MAX_ENTRIES = 100000
+    TOKEN_BATCH_CHUNK_SIZE = 500  # client_ids per IN query
+    
+    # ConnectedCar credential cache
+    CAR_CACHE_ENABLED = os.getenv('CAR_CACHE_ENABLED', '1') == '1'
+    CAR_CACHE_SIZE = int(os.getenv('CAR_CACHE_SIZE', '10000'))
+    CAR_CACHE_TTL = 300  # Seconds a cached car stays valid
+    CAR_NEGATIVE_CACHE_TTL = 30  # Seconds an unknown client_id stays cached
+    
+    # Raw telemetry log, one segmented append-only log per car
+    TELEMETRY_SEGMENT_DIR = os.getenv('TELEMETRY_SEGMENT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploaded_files', 'segments'))
+    TELEMETRY_SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # Segment size that triggers rollover
+    TELEMETRY_SEGMENT_MAX_AGE = 3600  # Seconds a segment stays open before rollover
+    TELEMETRY_INDEX_INTERVAL = 4096  # Bytes of records between offset index entries
+    TELEMETRY_SEGMENT_COMPRESS = os.getenv('TELEMETRY_SEGMENT_COMPRESS', '1') == '1'  # Gzip closed segments
+    TELEMETRY_READ_MAX_RECORDS = 100000  # Largest range one /telemetry/records call returns
     
     # Car-specific Configuration
     ALLOWED_SCOPES = [
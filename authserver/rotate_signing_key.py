@@ -0,0 +1,13 @@
+"""Add a new access-token signing key to JWT_KEY_DIR.
+
+Restart the auth server afterwards to sign with it. Older keys stay
+published in the JWKS until their PEM files are removed, which is safe once
+the tokens they signed have expired (Config.TOKEN_EXPIRES_IN).
+"""
+import sys
+from config import Config
+from app.signing_keys import write_signing_key
+
+algorithm = sys.argv[1] if len(sys.argv) > 1 else Config.JWT_ALGORITHM
+kid = write_signing_key(Config.JWT_KEY_DIR, algorithm)
+print(f"Created {algorithm} signing key {kid} in {Config.JWT_KEY_DIR}")
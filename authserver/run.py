@@ -1,6 +1,9 @@
 from app import create_app
+from werkzeug.serving import WSGIRequestHandler
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Serve HTTP/1.1 so pooled clients can keep connections alive
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(debug=True, port=5001)
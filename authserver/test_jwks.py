@@ -0,0 +1,34 @@
+import jwt
+import pytest
+from config import Config
+from app import create_app
+from app.signing_keys import get_signing_keys
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Point the auth server at a scratch database, key directory and telemetry log"""
+    monkeypatch.setattr(Config, 'SECRET_KEY', 'test-secret-key-0123456789abcdef')
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'auth.db'}")
+    monkeypatch.setattr(Config, 'JWT_KEY_DIR', str(tmp_path / 'keys'))
+    monkeypatch.setattr(Config, 'TELEMETRY_SEGMENT_DIR', str(tmp_path / 'segments'))
+    monkeypatch.setattr(Config, 'AUTH_CODE_PURGE_INTERVAL', 0)
+    return Config
+
+@pytest.mark.parametrize('algorithm', ['ES256', 'EdDSA'])
+def test_jwks_verifies_issued_tokens(config, monkeypatch, algorithm):
+    monkeypatch.setattr(config, 'JWT_ALGORITHM', algorithm)
+    app = create_app()
+
+    response = app.test_client().get('/.well-known/jwks.json')
+    assert response.status_code == 200
+    assert 'max-age' in response.headers['Cache-Control']
+    keys = {jwk['kid']: jwk for jwk in response.get_json()['keys']}
+
+    with app.app_context():
+        token = get_signing_keys().sign({'client_id': 'test_car_1'})
+
+    header = jwt.get_unverified_header(token)
+    jwk = keys[header['kid']]
+    assert jwk['alg'] == algorithm and 'd' not in jwk
+    claims = jwt.decode(token, jwt.PyJWK(jwk).key, algorithms=[algorithm])
+    assert claims['client_id'] == 'test_car_1'
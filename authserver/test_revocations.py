@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, text
+from config import Config
+from app import create_app
+from app.models import db, RevokedToken
+from app.refresh_tokens import purge_expired_tokens
+from app.utils import generate_car_access_token
+
+PROVISIONING_KEY = 'test-provisioning-key'
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Point the auth server at a scratch database, key directory and telemetry log"""
+    monkeypatch.setattr(Config, 'SECRET_KEY', 'test-secret-key-0123456789abcdef')
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'auth.db'}")
+    monkeypatch.setattr(Config, 'JWT_KEY_DIR', str(tmp_path / 'keys'))
+    monkeypatch.setattr(Config, 'TELEMETRY_SEGMENT_DIR', str(tmp_path / 'segments'))
+    monkeypatch.setattr(Config, 'AUTH_CODE_PURGE_INTERVAL', 0)
+    monkeypatch.setattr(Config, 'PROVISIONING_KEY', PROVISIONING_KEY)
+    return Config
+
+def revoke(client, app):
+    with app.app_context():
+        token = generate_car_access_token('test_car_1', 'TEST1234567890123', 'engine_start')
+    response = client.post('/revoke', data={'token': token}, headers={'X-Provisioning-Key': PROVISIONING_KEY})
+    assert response.status_code == 200
+    return response.get_json()['jti']
+
+def test_revocation_after_purge_is_not_skipped(config):
+    app = create_app()
+    client = app.test_client()
+    for _ in range(3):
+        revoke(client, app)
+    cursor = client.get('/revocations').get_json()['cursor']
+    assert cursor == 3
+
+    # The newest entries expire and are purged; their seqs must not be handed out again
+    with app.app_context():
+        RevokedToken.query.filter(RevokedToken.seq >= 2).update(
+            {'expires_at': datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False
+        )
+        db.session.commit()
+        assert purge_expired_tokens() == 2
+
+    jti = revoke(client, app)
+    page = client.get(f'/revocations?since={cursor}').get_json()
+    assert [entry['jti'] for entry in page['revocations']] == [jti]
+    assert page['cursor'] > cursor
+
+def test_upgrade_keeps_rows_and_stops_seq_reuse(config):
+    engine = create_engine(config.SQLALCHEMY_DATABASE_URI)
+    with engine.begin() as connection:
+        # revoked_token as created before it used AUTOINCREMENT
+        connection.execute(text(
+            'CREATE TABLE revoked_token (seq INTEGER NOT NULL PRIMARY KEY, jti VARCHAR(32) NOT NULL UNIQUE, '
+            'client_id VARCHAR(100) NOT NULL, expires_at DATETIME NOT NULL, revoked_at DATETIME)'
+        ))
+        connection.execute(text(
+            "INSERT INTO revoked_token VALUES (7, 'old', 'test_car_1', '2999-01-01 00:00:00', NULL)"
+        ))
+    engine.dispose()
+
+    app = create_app()
+    with app.app_context():
+        assert [(row.seq, row.jti) for row in RevokedToken.query.all()] == [(7, 'old')]
+        RevokedToken.query.delete()
+        db.session.commit()
+    jti = revoke(app.test_client(), app)
+    with app.app_context():
+        assert RevokedToken.query.filter_by(jti=jti).one().seq == 8
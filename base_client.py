@@ -1,15 +1,18 @@
 from web3 import Web3
 import json
-import requests
-from eth_account.messages import encode_defunct
+from http_transport import get_transport
+from signing_service import sign_nonce
 import hashlib
 import os
 
 class BaseClient:
-    def __init__(self, client_name):
+    def __init__(self, client_name, transport=None):
         # Connect to local Geth node
         self.w3 = Web3(Web3.HTTPProvider('http://localhost:8545'))
         
+        # Pooled keep-alive HTTP transport shared with every other client
+        self.http = transport or get_transport()
+        
         # Load accounts
         with open('accounts.json', 'r') as f:
             accounts = json.load(f)
@@ -33,7 +36,7 @@ class BaseClient:
         try:
             # Step 1: Get nonce from resource server
             print(f"\n{self.client_name}: Getting nonce from resource server...")
-            response = requests.get('http://localhost:5002/get-nonce')
+            response = self.http.get('http://localhost:5002/get-nonce')
             if response.status_code != 200:
                 print(f"Error getting nonce: {response.text}")
                 return None
@@ -43,13 +46,7 @@ class BaseClient:
             
             # Step 2: Sign the nonce
             print("\nSigning nonce...")
-            message_hash = self.w3.solidity_keccak(['string'], [nonce])
-            eth_message = encode_defunct(primitive=message_hash)
-            signed_message = self.w3.eth.account.sign_message(
-                eth_message,
-                private_key=self.private_key
-            )
-            signature = signed_message.signature.hex()
+            signature = sign_nonce(self.private_key, nonce)
             
             # Step 3: Request telemetry data with signed nonce
             print(f"\nRequesting telemetry data from endpoint: {self.endpoint}")
@@ -58,7 +55,7 @@ class BaseClient:
                 'X-Signature': signature
             }
             
-            response = requests.get(
+            response = self.http.get(
                 f'http://localhost:5002{self.endpoint}',
                 headers=headers
             )
@@ -80,7 +77,7 @@ class BaseClient:
         try:
             # Step 1: Get nonce
             print(f"\n{self.client_name}: Getting nonce for file download...")
-            response = requests.get('http://localhost:5002/get-nonce')
+            response = self.http.get('http://localhost:5002/get-nonce')
             if response.status_code != 200:
                 print(f"Error getting nonce: {response.text}")
                 return None
@@ -89,13 +86,7 @@ class BaseClient:
             
             # Step 2: Sign the nonce
             print("\nSigning nonce...")
-            message_hash = self.w3.solidity_keccak(['string'], [nonce])
-            eth_message = encode_defunct(primitive=message_hash)
-            signed_message = self.w3.eth.account.sign_message(
-                eth_message,
-                private_key=self.private_key
-            )
-            signature = signed_message.signature.hex()
+            signature = sign_nonce(self.private_key, nonce)
             
             # Step 3: Request file
             endpoint = f'/mercedes/files/{self.client_name}/{filename}'
@@ -107,7 +98,7 @@ class BaseClient:
             }
             
             print(f"\nRequesting file: {filename}")
-            response = requests.get(
+            response = self.http.get(
                 f'http://localhost:5002{endpoint}',
                 headers=headers,
                 stream=True  # Stream large files
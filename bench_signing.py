@@ -0,0 +1,65 @@
+"""Signatures-per-second benchmark for nonce signing.
+
+Compares the per-call path CombinedClient.sign_nonce used before the signing
+service existed (solidity_keccak, encode_defunct, and sign_message with the
+hex key re-parsed each time) with cached key objects in one process and with
+SigningService.sign_batch across a process pool.
+
+Usage:
+    python bench_signing.py --signatures 20000 --workers 8
+"""
+import argparse
+import json
+import secrets
+import time
+from web3 import Web3
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from signing_service import SigningService, sign_nonce
+
+def per_call_sign(w3, private_key, nonce):
+    message_hash = w3.solidity_keccak(['string'], [nonce])
+    signed_message = w3.eth.account.sign_message(encode_defunct(primitive=message_hash), private_key=private_key)
+    return signed_message.signature.hex()
+
+def measure(label, func, count):
+    start = time.perf_counter()
+    signatures = func()
+    elapsed = time.perf_counter() - start
+    assert len(signatures) == count
+    return signatures, {'name': label, 'seconds': round(elapsed, 3), 'signatures_per_s': round(count / elapsed, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nonce signing throughput")
+    parser.add_argument('--signatures', type=int, default=5000)
+    parser.add_argument('--keys', type=int, default=100, help="distinct vehicle keys in the batch")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    w3 = Web3()
+    keys = ['0x' + Account.create().key.hex().removeprefix('0x') for _ in range(args.keys)]
+    items = [(keys[i % len(keys)], secrets.token_hex(32)) for i in range(args.signatures)]
+
+    baseline, per_call = measure(
+        'per_call', lambda: [per_call_sign(w3, key, nonce) for key, nonce in items], len(items)
+    )
+    cached_signatures, cached = measure(
+        'cached_keys', lambda: [sign_nonce(key, nonce) for key, nonce in items], len(items)
+    )
+    with SigningService(workers=args.workers) as service:
+        service.sign_batch(items[:service.chunk_size * service.workers + 1])  # start the workers
+        batch_signatures, batch = measure('process_pool_batch', lambda: service.sign_batch(items), len(items))
+        batch['workers'] = service.workers
+
+    assert baseline == cached_signatures == batch_signatures, "signing paths disagree"
+
+    results = {
+        'signatures': len(items),
+        'keys': len(keys),
+        'runs': [per_call, cached, batch],
+        'batch_speedup': round(batch['signatures_per_s'] / per_call['signatures_per_s'], 2)
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark the nonce -> sign -> fetch sequence with and without the pooled transport.
+
+Runs the telemetry sequence CombinedClient.get_data performs, first with
+module-level requests calls (a new TCP connection per call), then through the
+shared HTTPTransport (keep-alive pools), and prints the latency saved per
+sequence.
+
+Usage:
+    python bench_transport.py --client-id tesla_models_1 --iterations 200
+"""
+import argparse
+import json
+import statistics
+import time
+import requests
+from web3 import Web3
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from http_transport import HTTPTransport
+
+def run_sequence(get, resource_server_url, client_id, private_key):
+    """One nonce -> sign -> fetch round, returning its latency in ms"""
+    start = time.perf_counter()
+    nonce = get(f"{resource_server_url}/get-nonce").json()["nonce"]
+
+    message_hash = Web3.solidity_keccak(['string'], [nonce])
+    signature = Account.sign_message(encode_defunct(primitive=message_hash), private_key=private_key).signature.hex()
+
+    response = get(
+        f"{resource_server_url}/mercedes/telemetry/{client_id}",
+        headers={'X-Nonce': nonce, 'X-Signature': signature}
+    )
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fresh-connection and pooled HTTP latency")
+    parser.add_argument('--client-id', default='tesla_models_1')
+    parser.add_argument('--resource-server', default='http://localhost:5002')
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    with open('accounts.json', 'r') as f:
+        private_key = json.load(f)[args.client_id]['private_key']
+
+    transport = HTTPTransport()
+    modes = {
+        'per_call_connection': requests.get,
+        'pooled_transport': transport.get,
+    }
+
+    results = {}
+    for name, get in modes.items():
+        # Warm up once so both modes start from the same state
+        run_sequence(get, args.resource_server, args.client_id, private_key)
+        latencies = [
+            run_sequence(get, args.resource_server, args.client_id, private_key)
+            for _ in range(args.iterations)
+        ]
+        results[name] = summarize(latencies)
+
+    transport.close()
+
+    results['saved_per_sequence_ms'] = round(
+        results['per_call_connection']['mean_ms'] - results['pooled_transport']['mean_ms'], 2
+    )
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
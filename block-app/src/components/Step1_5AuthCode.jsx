@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import useSessionEvents from '../hooks/useSessionEvents';
 
 const Step1_5AuthCode = ({ sessionId, generatedAuthCode, onValidate, onBack, config }) => {
   const [inputAuthCode, setInputAuthCode] = useState('');
@@ -8,15 +9,18 @@ const Step1_5AuthCode = ({ sessionId, generatedAuthCode, onValidate, onBack, con
   const [sessionData, setSessionData] = useState(null);
   const [copySuccess, setCopySuccess] = useState(false);
 
-  // Fetch session data on component mount
+  // Follow session progress over SSE instead of re-polling
   useEffect(() => {
-    if (sessionId) {
-      fetchSessionData();
-    } else {
+    if (!sessionId) {
       setError('❌ No session ID provided. Please go back and start over.');
     }
   }, [sessionId]);
 
+  useSessionEvents(sessionId, (data) => {
+    setSessionData(data);
+    setError('');
+  });
+
   const fetchSessionData = async () => {
     if (!sessionId) {
       setError('❌ No session ID available');
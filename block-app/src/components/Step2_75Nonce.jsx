@@ -1,4 +1,5 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
+import useSessionEvents from '../hooks/useSessionEvents';
 import { AlertCircle, CheckCircle, Loader2, RefreshCw, ArrowLeft, ArrowRight, Shield, Key, Hash } from 'lucide-react';
 
 const Step2_75Nonce = ({ 
@@ -15,30 +16,14 @@ const Step2_75Nonce = ({
   const [success, setSuccess] = useState('');
   const [step, setStep] = useState(initialNonce ? 2.8 : 2.75);
 
-  // Auto-load nonce if session exists but no nonce is provided
-  useEffect(() => {
-    if (sessionId && !nonce) {
-      checkSessionState();
+  // Pick up the nonce from the session event stream if it was requested elsewhere
+  useSessionEvents(sessionId, (sessionData) => {
+    if (sessionData.nonce !== undefined) {
+      setNonce(sessionData.nonce);
+      setAddress(sessionData.blockchain_address);
+      setStep(sessionData.step || 2.8);
     }
-  }, [sessionId]);
-
-  const checkSessionState = async () => {
-    try {
-      const response = await fetch(`http://localhost:8000/api/session/${sessionId}`);
-      const data = await response.json();
-      
-      if (data.success && data.session_data) {
-        const sessionData = data.session_data;
-        if (sessionData.nonce !== undefined) {
-          setNonce(sessionData.nonce);
-          setAddress(sessionData.blockchain_address);
-          setStep(sessionData.step || 2.8);
-        }
-      }
-    } catch (err) {
-      console.error('Error checking session state:', err);
-    }
-  };
+  });
 
   const requestNonce = async () => {
     if (!sessionId) {
@@ -1,4 +1,5 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
+import useSessionEvents from '../hooks/useSessionEvents';
 
 const Step4Complete = ({ 
   sessionId, 
@@ -14,41 +15,8 @@ const Step4Complete = ({
   const [error, setError] = useState(null);
   const [showResults, setShowResults] = useState(false);
 
-  // Fetch session data on component mount
-  useEffect(() => {
-    if (sessionId) {
-      fetchSessionData();
-    }
-  }, [sessionId]);
-
-  const fetchSessionData = async () => {
-    setLoading(true);
-    setError(null);
-    
-    try {
-      const response = await fetch(`${apiBaseUrl}/api/session/${sessionId}`, {
-        method: 'GET',
-        credentials: 'include',
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
-      const data = await response.json();
-      
-      if (data.success) {
-        setSessionData(data.session_data);
-      } else {
-        setError(data.error || 'Failed to fetch session data');
-      }
-    } catch (err) {
-      setError(`Error fetching session data: ${err.message}`);
-      console.error('Error fetching session data:', err);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // Follow session progress over SSE instead of re-polling
+  useSessionEvents(sessionId, setSessionData, apiBaseUrl);
 
   const handleRestart = async () => {
     setLoading(true);
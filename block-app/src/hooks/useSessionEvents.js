@@ -0,0 +1,35 @@
+import { useEffect, useRef } from 'react';
+
+// Subscribe to /api/session/<id>/events and call onUpdate with the merged
+// session data on the initial snapshot and on every step transition.
+const useSessionEvents = (sessionId, onUpdate, apiBaseUrl = 'http://localhost:8000') => {
+  const onUpdateRef = useRef(onUpdate);
+  onUpdateRef.current = onUpdate;
+
+  useEffect(() => {
+    if (!sessionId) return undefined;
+
+    let sessionData = {};
+    const source = new EventSource(`${apiBaseUrl}/api/session/${sessionId}/events`, {
+      withCredentials: true
+    });
+
+    const replace = (event) => {
+      sessionData = JSON.parse(event.data);
+      onUpdateRef.current(sessionData);
+    };
+    const merge = (event) => {
+      sessionData = { ...sessionData, ...JSON.parse(event.data) };
+      onUpdateRef.current(sessionData);
+    };
+
+    source.addEventListener('snapshot', replace);
+    source.addEventListener('reset', replace);
+    source.addEventListener('step', merge);
+    source.addEventListener('closed', () => source.close());
+
+    return () => source.close();
+  }, [sessionId, apiBaseUrl]);
+};
+
+export default useSessionEvents;
@@ -1,19 +1,73 @@
-import requests
+import argparse
+import fnmatch
 import json
 import sys
 import os
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from web3 import Web3
-from eth_account.messages import encode_defunct
 from datetime import datetime
+from http_transport import get_transport
+from signing_service import sign_nonce
+from telemetry_cache import parse_max_age
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_WORKERS = 4
+UPLOAD_CHUNK_RETRIES = 3
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def load_download_checkpoint(checkpoint_path, part_path, version):
+    """Read the sidecar of a partial download, or None if it cannot be resumed"""
+    try:
+        with open(checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('version') != str(version) or not checkpoint.get('file_hash'):
+            return None
+        # Never trust more bytes than actually reached the disk
+        checkpoint['offset'] = min(int(checkpoint['offset']), os.path.getsize(part_path))
+        if checkpoint.get('size') is not None and checkpoint['offset'] >= checkpoint['size']:
+            # Nothing left to request; a Range past the end would be rejected
+            return None
+        return checkpoint
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def total_size(response, offset):
+    """Full file size from Content-Range (206) or Content-Length (200), if known"""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    content_length = response.headers.get('Content-Length')
+    return offset + int(content_length) if content_length else None
+
+def save_download_checkpoint(checkpoint_path, offset, file_hash, version, size):
+    """Atomically record how much of a download is on disk"""
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'offset': offset, 'size': size, 'file_hash': file_hash, 'version': str(version)}, f)
+    os.replace(tmp_path, checkpoint_path)
 
 class CombinedClient:
-    def __init__(self, client_id, client_secret, auth_server_url, resource_server_url):
+    def __init__(self, client_id, client_secret, auth_server_url, resource_server_url, transport=None, cache=None,
+                 token_manager=None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.auth_server_url = auth_server_url.rstrip('/')
         self.resource_server_url = resource_server_url.rstrip('/')
         self.token = None
+        self.token_expires_in = None
+        self.refresh_token = None
+        self.scope = None
+        
+        # Optional TokenManager that caches and proactively refreshes tokens
+        self.token_manager = token_manager
+        
+        # Pooled keep-alive HTTP transport shared with every other client
+        self.http = transport or get_transport()
+        
+        # Optional TelemetryCache for get_data; None keeps every read uncached
+        self.cache = cache
         
         # Initialize Web3 and load account
         self.w3 = Web3(Web3.HTTPProvider('http://localhost:8545'))
@@ -26,7 +80,7 @@ class CombinedClient:
         """First step: Get authorization code"""
         try:
             print(f"\nRequesting authorization from {self.auth_server_url}/authorize")
-            response = requests.post(
+            response = self.http.post(
                 f"{self.auth_server_url}/authorize",
                 json={
                     "client_id": self.client_id,
@@ -51,7 +105,7 @@ class CombinedClient:
         """Second step: Exchange auth code for token"""
         try:
             print(f"\nExchanging auth code for token at {self.auth_server_url}/token")
-            response = requests.post(
+            response = self.http.post(
                 f"{self.auth_server_url}/token",
                 data={
                     "code": auth_code,
@@ -66,25 +120,94 @@ class CombinedClient:
             
             if response.status_code == 200:
                 token_data = response.json()
-                self.token = token_data["access_token"]
-                return self.token
+                self.refresh_token = token_data.get("refresh_token")
+                return self.record_token(token_data)
             return None
             
         except Exception as e:
             print(f"Token exchange error: {str(e)}")
             return None
 
+    def refresh_access_token(self):
+        """Trade the current refresh token for a new access and refresh token pair"""
+        if not self.refresh_token:
+            print("❌ No refresh token – perform authorization first")
+            return None
+        try:
+            print(f"\nRefreshing token at {self.auth_server_url}/token")
+            response = self.http.post(
+                f"{self.auth_server_url}/token",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "refresh_token": self.refresh_token,
+                    "grant_type": "refresh_token"
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+            
+            print(f"Refresh Response Status: {response.status_code}")
+            
+            if response.status_code == 200:
+                token_data = response.json()
+                self.refresh_token = token_data.get("refresh_token")
+                return self.record_token(token_data, self.scope)
+            
+            # A rejected refresh token is spent; the next call has to authorize again
+            print(f"Refresh Response: {response.text}")
+            self.refresh_token = None
+            return None
+            
+        except Exception as e:
+            print(f"Token refresh error: {str(e)}")
+            return None
+
+    def get_client_credentials_token(self, scope):
+        """Get a token straight from the client credentials, without an auth code"""
+        try:
+            print(f"\nRequesting client_credentials token from {self.auth_server_url}/token")
+            response = self.http.post(
+                f"{self.auth_server_url}/token",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "scope": scope,
+                    "grant_type": "client_credentials"
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+            
+            print(f"Token Response Status: {response.status_code}")
+            
+            if response.status_code == 200:
+                return self.record_token(response.json(), scope)
+            print(f"Token Response: {response.text}")
+            return None
+            
+        except Exception as e:
+            print(f"Token request error: {str(e)}")
+            return None
+
+    def record_token(self, token_data, scope=None):
+        """Keep a token response and its scope; a token manager then refreshes it before expiry"""
+        self.token = token_data["access_token"]
+        self.token_expires_in = token_data.get("expires_in")
+        self.scope = token_data.get("scope") or scope
+        if self.token_manager is not None and self.scope:
+            self.token_manager.remember(self, self.scope, self.token, self.token_expires_in)
+        return self.token
+
+    def current_token(self):
+        """Access token to send, refreshed before expiry when a token manager is set"""
+        if self.token_manager is not None and self.scope:
+            self.token = self.token_manager.get_token(self, self.scope)
+        return self.token
+
     def sign_nonce(self, nonce):
         """Sign nonce with private key using solidity keccak hash"""
         try:
             print("\nSigning nonce...")
-            message_hash = self.w3.solidity_keccak(['string'], [nonce])
-            eth_message = encode_defunct(primitive=message_hash)
-            signed_message = self.w3.eth.account.sign_message(
-                eth_message,
-                private_key=self.private_key
-            )
-            signature = signed_message.signature.hex()
+            signature = sign_nonce(self.private_key, nonce)
             print(f"Generated signature: {signature}")
             return signature
         except Exception as e:
@@ -94,9 +217,16 @@ class CombinedClient:
     def get_data(self, endpoint):
         """Complete flow to get data from resource server"""
         try:
+            cache_key = (self.client_id, endpoint)
+            if self.cache is not None:
+                cached = self.cache.get_fresh(cache_key)
+                if cached is not None:
+                    print(f"\nServing {endpoint} telemetry from cache")
+                    return cached
+            
             # Step 1: Get nonce
             print("\nGetting nonce...")
-            nonce_response = requests.get(
+            nonce_response = self.http.get(
                 f"{self.resource_server_url}/get-nonce"
             )
             
@@ -119,20 +249,31 @@ class CombinedClient:
                 'X-Signature': signature,
                 'Content-Type': 'application/json'
             }
+            etag = self.cache.etag(cache_key) if self.cache is not None else None
+            if etag:
+                headers['If-None-Match'] = etag
             
             # Use client_id directly as the endpoint
             url = f"{self.resource_server_url}/mercedes/telemetry/{self.client_id}"
             print(f"\nSending request to: {url}")
             print(f"Headers: {headers}")
             
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers)
             
             print(f"Response Status: {response.status_code}")
+            max_age = parse_max_age(response.headers.get('Cache-Control'))
+            if response.status_code == 304 and self.cache is not None:
+                data = self.cache.revalidate(cache_key, max_age)
+                if data is not None:
+                    return data
             if response.status_code != 200:
                 print(f"Error response: {response.text}")
                 return None
             
-            return response.json()
+            data = response.json()
+            if self.cache is not None:
+                self.cache.store(cache_key, data, response.headers.get('ETag'), max_age)
+            return data
             
         except Exception as e:
             print(f"Error getting data: {str(e)}")
@@ -140,7 +281,7 @@ class CombinedClient:
 
     def upload_raw_telemetry(self, text):
         """Send raw telemetry text to auth-server telemetry upload endpoint."""
-        if not self.token:
+        if not self.current_token():
             print("❌ No access token – authorize first")
             return False
 
@@ -155,7 +296,7 @@ class CombinedClient:
         }
         try:
             print(f"Uploading raw telemetry to {url} ...")
-            resp = requests.post(url, headers=headers, json=payload)
+            resp = self.http.post(url, headers=headers, json=payload)
             print(f"Status: {resp.status_code} {resp.text}")
             return resp.status_code == 201
         except Exception as e:
@@ -167,7 +308,7 @@ class CombinedClient:
     def upload_file(self, file_path, version='1'):
         """Upload a file to the resource server and register its hash on-chain"""
         try:
-            if not self.token:
+            if not self.current_token():
                 print("❌ No access token – perform authorization first")
                 return False
 
@@ -186,7 +327,7 @@ class CombinedClient:
                 files = {'file': (filename, f)}
                 data = {'version': version}
                 print(f"\nUploading file to: {url}")
-                response = requests.post(url, headers=headers, files=files, data=data)
+                response = self.http.post(url, headers=headers, files=files, data=data)
 
             if response.status_code != 200:
                 print(f"❌ Upload failed: {response.text}")
@@ -200,88 +341,284 @@ class CombinedClient:
             print(f"Error uploading file: {str(e)}")
             return False
 
-    def download_file(self, filename, version='1', save_path=None):
-        """Download and verify file from resource server"""
+    def _upload_chunk(self, upload_url, file_path, index, chunk_size, retries):
+        """PUT one chunk, retrying only this chunk on failure"""
+        with open(file_path, 'rb') as f:
+            f.seek(index * chunk_size)
+            chunk = f.read(chunk_size)
+
+        for attempt in range(1, retries + 1):
+            headers = {
+                'Authorization': f'Bearer {self.current_token()}',
+                'Content-Type': 'application/octet-stream'
+            }
+            try:
+                response = self.http.put(f"{upload_url}/chunks/{index}", data=chunk, headers=headers)
+                if response.status_code == 200:
+                    return True
+                print(f"Chunk {index} attempt {attempt} failed: {response.text}")
+                if 400 <= response.status_code < 500:
+                    return False
+            except Exception as e:
+                print(f"Chunk {index} attempt {attempt} error: {str(e)}")
+            time.sleep(min(0.2 * 2 ** attempt, 5))
+        return False
+
+    def upload_file_chunked(self, file_path, version='1', chunk_size=UPLOAD_CHUNK_SIZE,
+                            workers=UPLOAD_WORKERS, retries=UPLOAD_CHUNK_RETRIES):
+        """Upload a large file as parallel chunks and register its hash on-chain once"""
         try:
-            # Step 1: Get nonce
-            print("\nGetting nonce for file download...")
-            nonce_response = requests.get(
-                f"{self.resource_server_url}/get-nonce"
-            )
-            
-            if nonce_response.status_code != 200:
-                print(f"Failed to get nonce: {nonce_response.text}")
-                return None
-                
-            nonce = nonce_response.json()["nonce"]
-            print(f"Received nonce: {nonce}")
-            
-            # Step 2: Sign nonce
-            signature = self.sign_nonce(nonce)
-            if not signature:
-                print("Failed to sign nonce")
-                return None
-            
-            # Step 3: Request file
+            if not self.current_token():
+                print("❌ No access token – perform authorization first")
+                return False
+
+            filename = os.path.basename(file_path)
+            size = os.path.getsize(file_path)
+            base_url = f"{self.resource_server_url}/mercedes/upload/{self.client_id}"
             headers = {
-                'X-Nonce': nonce,
-                'X-Signature': signature,
-                'X-Version': str(version),
+                'Authorization': f'Bearer {self.token}',
                 'X-Client-Address': self.address
             }
-            
-            # Use client_id for the filename
-            if filename == "latest_update":
-                filename = f"{self.client_id}_latest_update"
-            
-            # Format endpoint for resource server
-            endpoint = f'/mercedes/files/{self.client_id}/{filename}'
-            url = f"{self.resource_server_url}{endpoint}"
-            print(f"\nRequesting file from: {url}")
-            print(f"Headers: {headers}")
-            
-            response = requests.get(
-                url,
+
+            print(f"\nStarting chunked upload of {filename} ({size} bytes)")
+            response = self.http.post(
+                f"{base_url}/initiate",
                 headers=headers,
-                stream=True
+                json={'filename': filename, 'size': size, 'chunk_size': chunk_size, 'version': version}
             )
-            
+            if response.status_code != 201:
+                print(f"❌ Upload initiation failed: {response.text}")
+                return False
+
+            upload = response.json()
+            upload_url = f"{base_url}/{upload['upload_id']}"
+            indexes = range(upload['total_chunks'])
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(
+                    lambda index: self._upload_chunk(upload_url, file_path, index, chunk_size, retries),
+                    indexes
+                ))
+
+            failed = [index for index, ok in zip(indexes, results) if not ok]
+            if failed:
+                print(f"❌ Chunks failed after {retries} attempts: {failed}")
+                self.http.request('DELETE', upload_url, headers=headers)
+                return False
+
+            # The server keeps the upload until /complete succeeds, so 5xx replies are retried
+            for attempt in range(retries):
+                response = self.http.post(f"{upload_url}/complete", headers=headers)
+                if response.status_code < 500:
+                    break
+                time.sleep(2 ** attempt)
             if response.status_code != 200:
-                print(f"Error downloading file: {response.text}")
+                print(f"❌ Upload completion failed: {response.text}")
                 return False
+
+            print("✅ File uploaded successfully!")
+            print(json.dumps(response.json(), indent=2))
+            return True
+        except Exception as e:
+            print(f"Error uploading file: {str(e)}")
+            return False
+
+    def open_file_stream(self, filename, version='1', offset=0):
+        """Sign a nonce and open a streaming GET for a file on the resource server.
+
+        A non-zero offset asks for the rest of the file with a Range header; the
+        server answers 206, or 200 if it sent the whole file instead. Returns
+        the open response, or None if the nonce or request failed. The caller
+        is responsible for closing it.
+        """
+        # Step 1: Get nonce
+        print("\nGetting nonce for file download...")
+        nonce_response = self.http.get(
+            f"{self.resource_server_url}/get-nonce"
+        )
+        
+        if nonce_response.status_code != 200:
+            print(f"Failed to get nonce: {nonce_response.text}")
+            return None
             
+        nonce = nonce_response.json()["nonce"]
+        print(f"Received nonce: {nonce}")
+        
+        # Step 2: Sign nonce
+        signature = self.sign_nonce(nonce)
+        if not signature:
+            print("Failed to sign nonce")
+            return None
+        
+        # Step 3: Request file
+        headers = {
+            'X-Nonce': nonce,
+            'X-Signature': signature,
+            'X-Version': str(version),
+            'X-Client-Address': self.address
+        }
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        
+        # Use client_id for the filename
+        if filename == "latest_update":
+            filename = f"{self.client_id}_latest_update"
+        
+        # Format endpoint for resource server
+        endpoint = f'/mercedes/files/{self.client_id}/{filename}'
+        url = f"{self.resource_server_url}{endpoint}"
+        print(f"\nRequesting file from: {url}")
+        print(f"Headers: {headers}")
+        
+        response = self.http.get(
+            url,
+            headers=headers,
+            stream=True
+        )
+        
+        if response.status_code not in (200, 206):
+            print(f"Error downloading file: {response.text}")
+            response.close()
+            return None
+        
+        return response
+
+    def download_file(self, filename, version='1', save_path=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """Download and verify file from resource server, resuming an interrupted download"""
+        try:
             # Step 4: Save and verify file
+            if filename == "latest_update":
+                filename = f"{self.client_id}_latest_update"
             if save_path is None:
                 save_path = os.path.join('downloads', self.client_id, filename)
             
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+            part_path = save_path + '.part'
+            checkpoint_path = part_path + '.json'
+            
+            checkpoint = load_download_checkpoint(checkpoint_path, part_path, version)
+            offset = checkpoint['offset'] if checkpoint else 0
             
+            response = self.open_file_stream(filename, version, offset=offset)
+            if response is None:
+                return False
+            
+            server_hash = response.headers.get('X-File-Hash')
+            if response.status_code != 206 or (checkpoint and checkpoint['file_hash'] != server_hash):
+                if offset and response.status_code == 206:
+                    # The file changed on the server since the partial download
+                    print("Server file changed since the last attempt, restarting download")
+                    response.close()
+                    response = self.open_file_stream(filename, version)
+                    if response is None:
+                        return False
+                    server_hash = response.headers.get('X-File-Hash')
+                offset = 0
+            elif offset:
+                print(f"Resuming download at byte {offset}")
+            
+            size = total_size(response, offset)
+            
+            # Rehash the bytes already on disk once, then keep hashing as chunks arrive
             sha3_hash = hashlib.sha3_256()
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        sha3_hash.update(chunk)
-                        f.write(chunk)
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                if offset:
+                    f.truncate(offset)
+                    with open(part_path, 'rb') as existing:
+                        for chunk in iter(lambda: existing.read(chunk_size), b''):
+                            sha3_hash.update(chunk)
+                
+                with response:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            sha3_hash.update(chunk)
+                            f.write(chunk)
+                            offset += len(chunk)
+                            f.flush()
+                            save_download_checkpoint(checkpoint_path, offset, server_hash, version, size)
             
             calculated_hash = '0x' + sha3_hash.hexdigest()
-            server_hash = response.headers.get('X-File-Hash')
             
             if calculated_hash != server_hash:
                 print("⚠️ Warning: File hash mismatch!")
-                os.remove(save_path)
+                os.remove(part_path)
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
                 return False
             
+            os.replace(part_path, save_path)
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            
             print(f"✅ File downloaded and verified: {save_path}")
             print(f"📝 File hash: {calculated_hash}")
             return True
             
         except Exception as e:
             print(f"Error downloading file: {str(e)}")
+            print("Partial download kept; calling download_file again resumes it")
             return False
 
+def select_vehicles(selector, accounts):
+    """Match a comma-separated list of client ids or globs against accounts.json"""
+    patterns = [pattern.strip() for pattern in selector.split(',') if pattern.strip()]
+    return [
+        client_id for client_id in accounts
+        if any(fnmatch.fnmatchcase(client_id, pattern) for pattern in patterns)
+    ]
+
+def fleet_main(argv):
+    """Run the flow for many vehicles concurrently and print one NDJSON line per vehicle"""
+    import asyncio
+    from async_combined_client import stream_fleet, load_accounts, DEFAULT_CONCURRENCY
+
+    parser = argparse.ArgumentParser(
+        prog="combined_client.py fleet",
+        description="Run authorize, token and data/download for every selected vehicle"
+    )
+    parser.add_argument('selector', nargs='?', default='tesla_*',
+                        help="comma-separated client ids or globs, e.g. 'tesla_models_*,tesla_model3_2'")
+    parser.add_argument('--mode', choices=['1', '2'], default='1', help="1: telemetry data, 2: file download")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="max requests in flight")
+    parser.add_argument('--scope', default=None, help="scope to request (defaults to the mode's scope)")
+    parser.add_argument('--auth-server', default='http://localhost:5001')
+    parser.add_argument('--resource-server', default='http://localhost:5002')
+    parser.add_argument('--accounts', default='accounts.json')
+    args = parser.parse_args(argv)
+
+    accounts = load_accounts(args.accounts)
+    client_ids = select_vehicles(args.selector, accounts)
+    if not client_ids:
+        print(f"No vehicles in {args.accounts} match '{args.selector}'", file=sys.stderr)
+        return 1
+
+    async def sweep():
+        failed = 0
+        async for result in stream_fleet(
+            client_ids, args.mode, args.concurrency, args.auth_server, args.resource_server,
+            scope=args.scope, accounts=accounts
+        ):
+            result.pop('data', None)
+            failed += not result['success']
+            print(json.dumps(result), flush=True)
+        return failed
+
+    started = time.perf_counter()
+    failed = asyncio.run(sweep())
+    print(
+        f"{len(client_ids) - failed}/{len(client_ids)} vehicles healthy "
+        f"in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
 def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "fleet":
+        sys.exit(fleet_main(sys.argv[2:]))
+
     if len(sys.argv) != 2:
         print("Usage: python3 combined_client.py <mode>")
+        print("       python3 combined_client.py fleet [selector] [--mode 1|2] [--concurrency N]")
         print("Mode 1: Get telemetry data")
         print("Mode 2: Download file")
         sys.exit(1)
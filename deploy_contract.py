@@ -4,6 +4,7 @@ from eth_account import Account
 import time
 import os
 from solcx import install_solc, set_solc_version, compile_source
+from nonce_manager import get_nonce_manager
 
 # Function to compile Solidity using py-solc-x
 def compile_solidity(source_code):
@@ -24,19 +25,22 @@ def compile_solidity(source_code):
 
 # Connect to local Geth node
 w3 = Web3(Web3.HTTPProvider('http://localhost:8545'))
+nonce_manager = get_nonce_manager(w3)
 
 def create_client_account():
     """Create a new Ethereum account"""
     try:
         acct = Account.create()
         deployer = w3.eth.accounts[0]
-        tx_hash = w3.eth.send_transaction({
-            'from': deployer,
-            'to': acct.address,
-            'value': w3.to_wei(1, 'ether'),
-            'gas': 21000,
-            'gasPrice': w3.eth.gas_price
-        })
+        with nonce_manager.reserve(deployer) as nonce:
+            tx_hash = w3.eth.send_transaction({
+                'from': deployer,
+                'to': acct.address,
+                'value': w3.to_wei(1, 'ether'),
+                'gas': 21000,
+                'gasPrice': w3.eth.gas_price,
+                'nonce': nonce
+            })
         w3.eth.wait_for_transaction_receipt(tx_hash)
         return {
             'address': acct.address,
@@ -92,7 +96,7 @@ def main():
         tesla_endpoints = [endpoints[client] for client in clients if client.startswith('tesla_')]
 
         print("\nDeploying contract...")
-        nonce = w3.eth.get_transaction_count(deployer)
+        nonce = nonce_manager.next(deployer)
 
         gas_estimate = Contract.constructor(tesla_addresses, tesla_endpoints).estimate_gas({'from': deployer})
         print(f"Estimated gas: {gas_estimate}")
@@ -104,7 +108,11 @@ def main():
             'nonce': nonce
         })
 
-        tx_hash = w3.eth.send_transaction(transaction)
+        try:
+            tx_hash = w3.eth.send_transaction(transaction)
+        except Exception:
+            nonce_manager.reset(deployer)
+            raise
         print("Waiting for transaction to be mined...")
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
         print(f"Contract deployed at: {tx_receipt.contractAddress}")
@@ -120,19 +128,27 @@ def main():
 
         print("\nDeployment complete!")
 
+        # Submit all funding transactions back to back, then wait for them together
+        gas_price = w3.eth.gas_price
+        pending = []
         for client_name, client_data in clients.items():
             if client_name.startswith('tesla_'):
                 balance = w3.eth.get_balance(client_data['address'])
                 if balance == 0:
-                    tx_hash = w3.eth.send_transaction({
-                        'from': w3.eth.accounts[0],
-                        'to': client_data['address'],
-                        'value': w3.to_wei(1, 'ether'),
-                        'gas': 21000,
-                        'gasPrice': w3.eth.gas_price
-                    })
-                    w3.eth.wait_for_transaction_receipt(tx_hash)
-                    print(f"Funded {client_name} with 1 ETH")
+                    with nonce_manager.reserve(deployer) as nonce:
+                        tx_hash = w3.eth.send_transaction({
+                            'from': deployer,
+                            'to': client_data['address'],
+                            'value': w3.to_wei(1, 'ether'),
+                            'gas': 21000,
+                            'gasPrice': gas_price,
+                            'nonce': nonce
+                        })
+                    pending.append((client_name, tx_hash))
+
+        for client_name, tx_hash in pending:
+            w3.eth.wait_for_transaction_receipt(tx_hash)
+            print(f"Funded {client_name} with 1 ETH")
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -0,0 +1,81 @@
+"""Shared HTTP transport for the vehicle clients.
+
+Wraps one requests.Session so CombinedClient, BaseClient and the gateway reuse
+keep-alive connections to the auth and resource servers instead of opening a
+new TCP connection per call. Every request gets a default timeout, and
+idempotent requests are retried with jittered exponential backoff.
+"""
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (
+    float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05')),
+    float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+)
+DEFAULT_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+DEFAULT_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+
+# Methods that are safe to resend after a read error or 5xx response.
+# Connection errors are retried for every method since nothing was sent.
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+class JitteredRetry(Retry):
+    """Retry policy using full jitter on top of exponential backoff"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+class HTTPTransport:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff_factor=0.2, pool_size=DEFAULT_POOL_SIZE):
+        self.timeout = timeout
+        retry = JitteredRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False
+        )
+        # One keep-alive pool per host, up to pool_size connections each
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session with the default timeout"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+def get_transport():
+    """Return the process-wide transport shared by all clients"""
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = HTTPTransport()
+        return _default_transport
@@ -0,0 +1,109 @@
+"""Verification of auth-server access tokens against its published JWKS.
+
+The auth server signs tokens with ES256 or EdDSA keys and publishes their
+public halves at /.well-known/jwks.json. JWKSCache keeps those keys parsed
+and indexed by kid, so a token is verified once, with the key its header
+names, instead of being tried against every algorithm. The key set is
+cached for the max-age the auth server sends. A kid missing from the cache
+triggers one refetch, rate limited so forged kids cannot flood the auth
+server, which is how rotated-in keys are picked up.
+
+HS256 tokens are rejected unless JWT_ACCEPT_HS256=1 and SECRET_KEY are both
+set, for auth servers that still sign with the shared secret. Anyone who
+knows the secret can forge tokens, so keep it off once the auth server signs
+with asymmetric keys.
+"""
+import logging
+import os
+import threading
+import time
+import jwt
+from http_transport import get_transport
+from telemetry_cache import parse_max_age
+
+logger = logging.getLogger(__name__)
+
+AUTH_SERVER_URL = os.getenv('AUTH_SERVER_URL', 'http://localhost:5001')
+JWKS_DEFAULT_TTL = 300
+JWKS_MIN_REFRESH_INTERVAL = 30  # Minimum seconds between fetches, including after failures
+
+ASYMMETRIC_ALGORITHMS = ('ES256', 'EdDSA')
+
+def hs256_secret():
+    """The shared secret for HS256 tokens, or None unless HS256 is explicitly enabled"""
+    if os.getenv('JWT_ACCEPT_HS256', '0') != '1':
+        return None
+    return os.getenv('SECRET_KEY') or None
+
+class JWKSCache:
+    def __init__(self, auth_server_url=AUTH_SERVER_URL, transport=None, clock=time.monotonic):
+        self.jwks_url = f"{auth_server_url.rstrip('/')}/.well-known/jwks.json"
+        self.http = transport or get_transport()
+        self.clock = clock
+        self._keys = {}  # kid -> (algorithm, public key)
+        self._expires_at = 0
+        self._last_fetch = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Fetch the key set and replace the cached keys"""
+        self._last_fetch = self.clock()
+        response = self.http.get(self.jwks_url)
+        response.raise_for_status()
+
+        keys = {}
+        for jwk in response.json().get('keys', []):
+            if jwk.get('alg') not in ASYMMETRIC_ALGORITHMS or 'kid' not in jwk:
+                continue
+            try:
+                keys[jwk['kid']] = (jwk['alg'], jwt.PyJWK(jwk).key)
+            except jwt.PyJWKError as e:
+                logger.warning(f"Skipping unusable JWK {jwk['kid']}: {str(e)}")
+        self._keys = keys
+        self._expires_at = self._last_fetch + parse_max_age(
+            response.headers.get('Cache-Control'), JWKS_DEFAULT_TTL
+        )
+
+    def get_key(self, kid):
+        """(algorithm, public key) for a kid, or None if the auth server does not publish it"""
+        now = self.clock()
+        if now < self._expires_at and kid in self._keys:
+            return self._keys[kid]
+
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            now = self.clock()
+            if now < self._expires_at and kid in self._keys:
+                return self._keys[kid]
+            if self._last_fetch is None or now - self._last_fetch >= JWKS_MIN_REFRESH_INTERVAL:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep verifying with the keys we have if the auth server is unreachable
+                    logger.warning(f"JWKS refresh from {self.jwks_url} failed: {str(e)}")
+            return self._keys.get(kid)
+
+    def decode(self, token, secret_key=None):
+        """Verify a token's signature and expiry and return its claims; raises jwt.InvalidTokenError"""
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') == 'HS256':
+            if not secret_key:
+                raise jwt.InvalidTokenError("HS256 tokens are not accepted")
+            return jwt.decode(token, secret_key, algorithms=['HS256'])
+
+        entry = self.get_key(header.get('kid'))
+        if entry is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {header.get('kid')}")
+        algorithm, public_key = entry
+        return jwt.decode(token, public_key, algorithms=[algorithm])
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_jwks_cache(auth_server_url=None):
+    """Return the process-wide key cache for an auth server"""
+    auth_server_url = (auth_server_url or AUTH_SERVER_URL).rstrip('/')
+    with _caches_lock:
+        if auth_server_url not in _caches:
+            _caches[auth_server_url] = JWKSCache(auth_server_url)
+        return _caches[auth_server_url]
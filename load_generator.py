@@ -0,0 +1,196 @@
+"""Fleet load generator for the resource server.
+
+Replays the real vehicle protocol (get nonce, keccak-sign it, fetch telemetry
+or the update file) for N vehicles from accounts.json with open-loop Poisson
+arrivals at a configurable rate. A share of the traffic can sign with an
+invalid key, like bad_client.BadClient, and is expected to be rejected.
+
+Latency percentiles and throughput are reported per endpoint and traffic
+class as JSON so runs can be compared over time.
+
+Usage:
+    python load_generator.py --vehicles 20 --rate 50 --duration 30 \
+        --invalid-ratio 0.1 --workload mixed --output results.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+import httpx
+from async_combined_client import sign_resource_nonce, load_accounts
+
+# Same throwaway key BadClient signs with
+INVALID_PRIVATE_KEY = '0x1234567890abcdef1234567890abcdef1234567890abcdef1234567890abcdef'
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+
+    def record(self, key, latency_ms, outcome):
+        self.latencies[key].append(latency_ms)
+        self.outcomes[key][outcome] += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for key, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[key] = {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+                'p50_ms': round(percentile(values, 50), 2),
+                'p95_ms': round(percentile(values, 95), 2),
+                'p99_ms': round(percentile(values, 99), 2),
+                'max_ms': round(values[-1], 2),
+                'outcomes': dict(self.outcomes[key])
+            }
+        return endpoints
+
+async def timed_get(http, stats, key, url, expected_status, **kwargs):
+    """GET url, recording latency and whether the status matched expectations"""
+    start = time.perf_counter()
+    try:
+        response = await http.get(url, **kwargs)
+    except httpx.HTTPError as e:
+        stats.record(key, (time.perf_counter() - start) * 1000, f"error:{type(e).__name__}")
+        return None
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    outcome = 'expected' if response.status_code == expected_status else f"unexpected:{response.status_code}"
+    stats.record(key, latency_ms, outcome)
+    return response
+
+async def run_request(http, stats, resource_server_url, vehicle, workload, invalid, scheduled_at):
+    """One full nonce -> sign -> fetch sequence for a vehicle.
+
+    Sequence latency is measured from scheduled_at, the sequence's arrival
+    time, so time spent queued behind max_in_flight counts against the server
+    instead of being omitted.
+    """
+    client_id, account = vehicle
+    traffic = 'invalid' if invalid else 'valid'
+
+    nonce_response = await timed_get(http, stats, 'get_nonce', f"{resource_server_url}/get-nonce", 200)
+    if nonce_response is None or nonce_response.status_code != 200:
+        return
+    nonce = nonce_response.json()['nonce']
+
+    sign_start = time.perf_counter()
+    private_key = INVALID_PRIVATE_KEY if invalid else account['private_key']
+    loop = asyncio.get_running_loop()
+    signature = await loop.run_in_executor(None, sign_resource_nonce, nonce, private_key)
+    stats.record('sign', (time.perf_counter() - sign_start) * 1000, 'expected')
+
+    headers = {'X-Nonce': nonce, 'X-Signature': signature}
+    expected_status = 403 if invalid else 200
+
+    if workload == 'file':
+        headers.update({'X-Version': '1', 'X-Client-Address': account['address']})
+        filename = f"{client_id}_latest_update"
+        await timed_get(
+            http, stats, f"file.{traffic}",
+            f"{resource_server_url}/mercedes/files/{client_id}/{filename}",
+            expected_status, headers=headers
+        )
+    else:
+        await timed_get(
+            http, stats, f"telemetry.{traffic}",
+            f"{resource_server_url}/mercedes/telemetry/{client_id}",
+            expected_status, headers=headers
+        )
+
+    stats.record(f"sequence.{workload}.{traffic}", (time.perf_counter() - scheduled_at) * 1000, 'completed')
+
+async def generate_load(args):
+    accounts = load_accounts()
+    vehicles = [(name, accounts[name]) for name in accounts if name.startswith('tesla_')]
+    vehicles = list(itertools.islice(itertools.cycle(vehicles), args.vehicles))
+
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    rng = random.Random(args.seed)
+
+    async def bounded(*request_args):
+        async with in_flight:
+            await run_request(*request_args)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as http:
+        tasks = []
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        next_arrival = start
+        vehicle_cycle = itertools.cycle(vehicles)
+
+        # Open-loop Poisson arrivals: schedule regardless of completions
+        while next_arrival - start < args.duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            workload = args.workload
+            if workload == 'mixed':
+                workload = 'file' if rng.random() < 0.5 else 'telemetry'
+            invalid = rng.random() < args.invalid_ratio
+
+            tasks.append(asyncio.create_task(
+                bounded(http, stats, args.resource_server.rstrip('/'), next(vehicle_cycle), workload, invalid, next_arrival)
+            ))
+            next_arrival += rng.expovariate(args.rate)
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return {
+        'started_at': started_at,
+        'config': {
+            'resource_server': args.resource_server,
+            'vehicles': len(vehicles),
+            'rate': args.rate,
+            'duration_s': args.duration,
+            'invalid_ratio': args.invalid_ratio,
+            'workload': args.workload,
+            'max_in_flight': args.max_in_flight,
+            'seed': args.seed
+        },
+        'elapsed_s': round(elapsed, 3),
+        'sequences': len(tasks),
+        'endpoints': stats.report(elapsed)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the vehicle protocol against the resource server")
+    parser.add_argument('--resource-server', default='http://localhost:5002')
+    parser.add_argument('--vehicles', type=int, default=20, help="number of vehicles to simulate")
+    parser.add_argument('--rate', type=float, default=10.0, help="mean arrivals per second")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds to generate arrivals for")
+    parser.add_argument('--invalid-ratio', type=float, default=0.0, help="share of requests signed with an invalid key")
+    parser.add_argument('--workload', choices=['telemetry', 'file', 'mixed'], default='telemetry')
+    parser.add_argument('--max-in-flight', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(generate_load(args))
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Concurrent-session load test for the gateway API.
+
+Drives the same sequence of /api/* calls the block-app wizard makes, for many
+sessions at once, against the Flask gateway (server.py) and the ASGI gateway
+(async_server.py), and prints the throughput of each.
+
+Usage:
+    python server.py                                              # port 8000
+    GATEWAY_PORT=8001 python async_server.py                      # port 8001
+    python load_test_gateway.py --flask-url http://localhost:8000 \
+        --asgi-url http://localhost:8001 --sessions 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+
+WIZARD_STEPS = [
+    ('/api/auth/configure', None),
+    ('/api/auth/validate-code', 'auth_code'),
+    ('/api/token/generate', None),
+    ('/api/token/validate', None),
+    ('/api/nonce/request', None),
+    ('/api/nonce/sign', None),
+    ('/api/resource/telemetry', None),
+]
+
+async def run_session(http, base_url, config):
+    """Run one full wizard session, returning its latency or None on failure"""
+    start = time.perf_counter()
+    response = await http.post(f"{base_url}/api/session/create")
+    session_id = response.json()['session_id']
+
+    auth_code = None
+    for path, extra in WIZARD_STEPS:
+        payload = {'session_id': session_id}
+        if path == '/api/auth/configure':
+            payload.update(config)
+        if extra == 'auth_code':
+            payload['auth_code'] = auth_code
+
+        response = await http.post(f"{base_url}{path}", json=payload)
+        body = response.json()
+        if not body.get('success'):
+            return None
+        auth_code = body.get('auth_code', auth_code)
+
+    return time.perf_counter() - start
+
+async def run_load(base_url, sessions, concurrency, config):
+    """Run `sessions` wizard sessions with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=60, limits=limits) as http:
+        async def bounded():
+            async with semaphore:
+                try:
+                    return await run_session(http, base_url, config)
+                except (httpx.HTTPError, ValueError, KeyError):
+                    return None
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(bounded() for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    completed = sorted(l for l in latencies if l is not None)
+    return {
+        'base_url': base_url,
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'completed': len(completed),
+        'failed': sessions - len(completed),
+        'elapsed_s': round(elapsed, 3),
+        'sessions_per_s': round(len(completed) / elapsed, 2) if elapsed else 0.0,
+        'p50_s': round(statistics.median(completed), 3) if completed else None,
+        'p95_s': round(completed[int(len(completed) * 0.95) - 1], 3) if completed else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Flask and ASGI gateway throughput")
+    parser.add_argument('--flask-url', default='http://localhost:8000')
+    parser.add_argument('--asgi-url', default='http://localhost:8001')
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=25)
+    parser.add_argument('--client-id', default='tesla_models_3')
+    parser.add_argument('--client-secret', default='tesla_secret_3')
+    parser.add_argument('--auth-server', default='http://localhost:5001')
+    parser.add_argument('--resource-server', default='http://localhost:5002')
+    args = parser.parse_args()
+
+    config = {
+        'client_id': args.client_id,
+        'client_secret': args.client_secret,
+        'auth_server': args.auth_server,
+        'resource_server': args.resource_server,
+        'mode': '1',
+        'scopes': ['engine_start', 'door_unlock']
+    }
+
+    results = {}
+    for name, url in (('flask', args.flask_url), ('asgi', args.asgi_url)):
+        print(f"🚦 Running {args.sessions} sessions against {name} gateway at {url} ...")
+        results[name] = asyncio.run(run_load(url, args.sessions, args.concurrency, config))
+
+    print(json.dumps(results, indent=2))
+
+    if results['flask']['sessions_per_s']:
+        speedup = results['asgi']['sessions_per_s'] / results['flask']['sessions_per_s']
+        print(f"\n📈 ASGI / Flask throughput: {speedup:.2f}x")
+
+if __name__ == "__main__":
+    main()
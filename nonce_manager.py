@@ -0,0 +1,61 @@
+"""Local transaction-nonce tracking for blockchain addresses.
+
+The node is asked for an address's transaction count once, the first time the
+address is used or after a send fails. Every other nonce is handed out from a
+local counter, so scripts can submit many transactions back to back without
+an RPC round trip per nonce.
+"""
+import threading
+from contextlib import contextmanager
+
+class NonceManager:
+    def __init__(self, w3):
+        self.w3 = w3
+        self._nonces = {}
+        self._lock = threading.RLock()
+
+    def sync(self, address):
+        """Reload the pending transaction count for an address from the node"""
+        with self._lock:
+            self._nonces[address] = self.w3.eth.get_transaction_count(address, 'pending')
+            return self._nonces[address]
+
+    def current(self, address):
+        """Return the next nonce for an address without reserving it"""
+        with self._lock:
+            if address not in self._nonces:
+                return self.sync(address)
+            return self._nonces[address]
+
+    def next(self, address):
+        """Reserve and return the next nonce for an address"""
+        with self._lock:
+            nonce = self.current(address)
+            self._nonces[address] = nonce + 1
+            return nonce
+
+    def reset(self, address):
+        """Forget the local count so the next call resyncs from the node"""
+        with self._lock:
+            self._nonces.pop(address, None)
+
+    @contextmanager
+    def reserve(self, address):
+        """Reserve a nonce for one send, resyncing if the send fails"""
+        try:
+            yield self.next(address)
+        except Exception:
+            self.reset(address)
+            raise
+
+# One manager per node, shared by everything in the process talking to it
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_nonce_manager(w3):
+    """Return the shared NonceManager for the node behind this Web3 instance"""
+    key = getattr(w3.provider, 'endpoint_uri', None) or id(w3)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = NonceManager(w3)
+        return _managers[key]
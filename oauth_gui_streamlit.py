@@ -1,5 +1,7 @@
 import streamlit as st
 from combined_client import CombinedClient
+from nonce_manager import get_nonce_manager
+from jwks_cache import get_jwks_cache, hs256_secret
 import json
 from web3 import Web3
 import jwt
@@ -55,12 +57,9 @@ st.markdown("""
 # Load environment variables
 load_dotenv()
 
-def verify_token(token):
-    """Verify the JWT token"""
+def verify_token(token, auth_server_url=None):
+    """Verify the JWT token with the auth server's published key for its kid"""
     try:
-        # Use the same secret key as the auth server and resource server
-        secret_key = os.getenv('SECRET_KEY', 'your-secret-key')  # Make sure this matches your auth server's key
-        
         # Extract token from Bearer format if present
         if token.startswith('Bearer '):
             token = token.split(' ')[1]
@@ -77,26 +76,16 @@ def verify_token(token):
             st.error(f"Error decoding unverified payload: {str(e)}")
             return False, "Error decoding token payload"
         
-        # Try different algorithms if HS256 fails
-        algorithms = ['HS256', 'RS256']
-        for algorithm in algorithms:
-            try:
-                payload = jwt.decode(token, secret_key, algorithms=[algorithm])
-                st.write(f"Token successfully verified with {algorithm}")
-                st.write("Verified payload:", payload)
-                
-                # Verify required claims
-                if not all(k in payload for k in ['client_id', 'vin', 'scope']):
-                    return False, "Token missing required claims"
-                    
-                return True, payload
-            except jwt.InvalidAlgorithmError:
-                continue
-            except Exception as e:
-                st.write(f"Failed with {algorithm}: {str(e)}")
-                continue
-                
-        return False, "Could not verify token with any supported algorithm"
+        # Verify once with the key the header's kid names (HS256 only if explicitly enabled)
+        payload = get_jwks_cache(auth_server_url).decode(token, hs256_secret())
+        st.write(f"Token successfully verified with {headers.get('alg')} key {headers.get('kid')}")
+        st.write("Verified payload:", payload)
+        
+        # Verify required claims
+        if not all(k in payload for k in ['client_id', 'vin', 'scope']):
+            return False, "Token missing required claims"
+            
+        return True, payload
         
     except jwt.ExpiredSignatureError:
         return False, "Token has expired"
@@ -129,7 +118,8 @@ def store_hash_on_chain(file_hash: str):
         "value": 0,
         "data": w3.to_bytes(hexstr=file_hash),
         "gasPrice": w3.to_wei("1", "gwei"),
-        "nonce": w3.eth.get_transaction_count(sender),
+        # No nonce: the node signs for sender and assigns it, which stays correct
+        # when other processes send from the same account
     }
 
     # Estimate gas based on payload size and add a small buffer
@@ -395,7 +385,7 @@ def main():
                             st.session_state.token = token
                             
                             # Verify token with resource server
-                            is_valid, message = verify_token(token)
+                            is_valid, message = verify_token(token, st.session_state.client.auth_server_url)
                             
                             if is_valid:
                                 st.session_state.token_validated = True
@@ -443,7 +433,7 @@ def main():
                 if st.button("📥 Request Nonce", use_container_width=True, type="primary"):
                     with st.spinner("Requesting nonce..."):
                         try:
-                            nonce = st.session_state.client.w3.eth.get_transaction_count(
+                            nonce = get_nonce_manager(st.session_state.client.w3).current(
                                 st.session_state.client.address
                             )
                             st.session_state.nonce = nonce
@@ -2,6 +2,7 @@ from web3 import Web3
 import json
 import os
 from hashlib import sha3_256
+from nonce_manager import get_nonce_manager
 
 def calculate_file_hash(file_path):
     """Calculate SHA3 hash of a file"""
@@ -27,12 +28,14 @@ def main():
     
     # Get deployer account
     deployer = w3.eth.accounts[0]
+    nonce_manager = get_nonce_manager(w3)
     
     # Load client addresses
     with open('accounts.json', 'r') as f:
         accounts = json.load(f)
     
-    # Register file hashes for all Tesla clients
+    # Register file hashes for all Tesla clients, sending back to back
+    pending = []
     for client_name in accounts:
         if not client_name.startswith('tesla_'):
             continue
@@ -73,14 +76,21 @@ Vehicle-specific updates for {client_name}:
         
         # Store the file hash in the contract
         try:
-            tx_hash = contract.functions.storeFileHash(
-                Web3.to_checksum_address(client_address),
-                file_name,
-                Web3.to_bytes(hexstr=file_hash),
-                1  # version 1
-            ).transact({'from': deployer})
-            
-            # Wait for transaction to be mined
+            with nonce_manager.reserve(deployer) as nonce:
+                tx_hash = contract.functions.storeFileHash(
+                    Web3.to_checksum_address(client_address),
+                    file_name,
+                    Web3.to_bytes(hexstr=file_hash),
+                    1  # version 1
+                ).transact({'from': deployer, 'nonce': nonce})
+            pending.append((client_name, tx_hash))
+                
+        except Exception as e:
+            print(f"Error registering hash for {client_name}: {str(e)}")
+    
+    # Wait for all transactions to be mined
+    for client_name, tx_hash in pending:
+        try:
             receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
             
             if receipt.status == 1:
@@ -1,10 +1,12 @@
 from flask import Flask, request, jsonify, send_file
+from werkzeug.serving import WSGIRequestHandler
 from web3 import Web3
 import json
 import secrets
 import logging
 import hashlib
 import os
+import glob
 import jwt
 from functools import wraps
 from dotenv import load_dotenv
@@ -14,6 +16,8 @@ import random
 from datetime import datetime, timedelta
 import copy
 import sqlite3
+from revocation_list import RevocationList
+from jwks_cache import get_jwks_cache, hs256_secret
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -53,14 +57,16 @@ def load_contract():
 # Load contract at startup
 contract = load_contract()
 
-# Auth server configuration - use app.config for secret key
-AUTH_SERVER_SECRET = app.config['SECRET_KEY']  # Use same secret as auth server
+# Access tokens are checked against the auth server's JWKS; the shared secret is
+# only used for HS256 tokens when JWT_ACCEPT_HS256=1 and SECRET_KEY are set
+AUTH_SERVER_SECRET = hs256_secret()
+
+# Tokens revoked on the auth server, mirrored in memory by a polling thread
+revocation_list = RevocationList()
 
 def verify_auth_token(token):
     """Verify the JWT token from the auth server"""
     try:
-        logger.info(f"Verifying token with secret: {app.config['SECRET_KEY']}")
-        
         # Extract token from Authorization header
         if token.startswith('Bearer '):
             token = token.split(' ')[1]
@@ -76,8 +82,8 @@ def verify_auth_token(token):
         except Exception as e:
             logger.error(f"Error decoding unverified payload: {str(e)}")
         
-        # Verify token with the auth server's secret key
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        # Verify token with the auth server key named by its kid
+        payload = get_jwks_cache().decode(token, AUTH_SERVER_SECRET)
         logger.info(f"Verified payload: {payload}")
         
         # Verify required claims
@@ -90,9 +96,10 @@ def verify_auth_token(token):
             logger.error("Invalid token type")
             return None
             
-        # Verify kid in header (optional)
-        if 'kid' not in headers or headers['kid'] != 'car-auth-key-1':
-            logger.warning("Token missing or has invalid kid")
+        # Reject tokens revoked before their exp
+        if 'jti' in payload and revocation_list.is_revoked(payload['jti']):
+            logger.error(f"Token {payload['jti']} has been revoked")
+            return None
             
         return payload
         
@@ -266,6 +273,20 @@ def calculate_file_hash(file_path):
             sha3_hash.update(chunk)
     return '0x' + sha3_hash.hexdigest()
 
+def store_file_hash(contract, client_address, filename, file_hash, version):
+    """Register a file hash on-chain from the admin account and wait for the receipt"""
+    admin = w3.eth.accounts[0]
+    # The node signs for admin and assigns the nonce itself, so transactions sent
+    # from the same account by other processes cannot make ours "nonce too low"
+    tx_hash = contract.functions.storeFileHash(
+        Web3.to_checksum_address(client_address),
+        filename,
+        Web3.to_bytes(hexstr=file_hash),
+        int(version)
+    ).transact({'from': admin})
+    w3.eth.wait_for_transaction_receipt(tx_hash)
+    return tx_hash
+
 @app.route('/get-nonce')
 def get_nonce():
     """Generate a random nonce for request signing"""
@@ -319,8 +340,22 @@ def update_telemetry_in_db(client_id, data):
     conn.commit()
     conn.close()
 
+# Telemetry refresh period, and when the background task last ran. Used to
+# tell clients how long a telemetry response stays valid.
+TELEMETRY_UPDATE_INTERVAL = 60
+last_telemetry_update = time.time()
+
+def telemetry_max_age():
+    """Seconds until the next background telemetry refresh"""
+    return max(0, int(last_telemetry_update + TELEMETRY_UPDATE_INTERVAL - time.time()))
+
+def telemetry_etag(data):
+    """Strong ETag for a telemetry snapshot"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
 def update_telemetry_data():
     """Background task to update telemetry data every minute"""
+    global last_telemetry_update
     while True:
         try:
             conn = sqlite3.connect('telemetry.db')
@@ -355,9 +390,10 @@ def update_telemetry_data():
             
             conn.commit()
             conn.close()
+            last_telemetry_update = time.time()
             
             logger.info(f"Telemetry data updated in database at {datetime.now()}")
-            time.sleep(60)  # Wait for 1 minute
+            time.sleep(TELEMETRY_UPDATE_INTERVAL)  # Wait for 1 minute
             
         except Exception as e:
             logger.error(f"Error updating telemetry data: {str(e)}")
@@ -420,7 +456,11 @@ def get_telemetry(endpoint):
         data = get_telemetry_from_db(client_name)
         if data:
             logger.info(f"Returning data for {client_name}")
-            return jsonify(data)
+            # Cacheable until the next refresh; If-None-Match gets a bodiless 304
+            response = jsonify(data)
+            response.set_etag(telemetry_etag(data))
+            response.headers['Cache-Control'] = f'private, max-age={telemetry_max_age()}'
+            return response.make_conditional(request)
         else:
             logger.error(f"No data found for {client_name}")
             return jsonify({'error': 'No data available for this client'}), 404
@@ -461,14 +501,7 @@ def upload_file(client_id):
             return jsonify({'error': 'Contract not loaded'}), 500
 
         try:
-            client_address = request.headers.get('X-Client-Address')
-            tx_hash = contract.functions.storeFileHash(
-                Web3.to_checksum_address(client_address),
-                filename,
-                Web3.to_bytes(hexstr=file_hash),
-                int(version)
-            ).transact({'from': w3.eth.accounts[0]})
-            w3.eth.wait_for_transaction_receipt(tx_hash)
+            tx_hash = store_file_hash(contract, request.headers.get('X-Client-Address'), filename, file_hash, version)
         except Exception as e:
             logger.error(f"Blockchain store failed: {str(e)}")
             return jsonify({'error': 'Blockchain store failed'}), 500
@@ -479,6 +512,235 @@ def upload_file(client_id):
         logger.error(f"Upload failed: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Chunked uploads in progress, keyed by upload_id. Chunks are written at their
+# offset in a preallocated .part file, and the SHA3 hash is advanced over the
+# contiguous prefix of received chunks so completion does not re-read the file.
+# Uploads idle for CHUNKED_UPLOAD_TTL seconds are discarded with their .part file.
+MAX_UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+CHUNKED_UPLOAD_TTL = int(os.getenv('CHUNKED_UPLOAD_TTL', '3600'))
+chunked_uploads = {}
+chunked_uploads_lock = threading.Lock()
+
+def get_chunked_upload(client_id, upload_id):
+    with chunked_uploads_lock:
+        upload = chunked_uploads.get(upload_id)
+    if upload is None or upload['client_id'] != client_id:
+        return None
+    return upload
+
+def advance_upload_hash(upload, index, chunk):
+    """Feed every chunk that now extends the contiguous prefix into the running hash"""
+    if index != upload['hashed_chunks']:
+        return
+    upload['hasher'].update(chunk)
+    upload['hashed_chunks'] += 1
+
+    # Later chunks that arrived early are read back from the part file
+    with open(upload['part_path'], 'rb') as f:
+        while upload['hashed_chunks'] in upload['received']:
+            f.seek(upload['hashed_chunks'] * upload['chunk_size'])
+            upload['hasher'].update(f.read(upload['chunk_size']))
+            upload['hashed_chunks'] += 1
+
+def expire_chunked_uploads():
+    """Discard idle uploads, and .part files left without an upload (e.g. by a restart)"""
+    now = time.time()
+    with chunked_uploads_lock:
+        expired = [
+            upload_id for upload_id, upload in chunked_uploads.items()
+            if not upload['completing'] and now - upload['last_activity'] > CHUNKED_UPLOAD_TTL
+        ]
+        for upload_id in expired:
+            chunked_uploads.pop(upload_id)
+        active_parts = {upload['part_path'] for upload in chunked_uploads.values()}
+
+    for client_dir in glob.glob(os.path.join('client_files', '*')):
+        for part_path in glob.glob(os.path.join(client_dir, '.*.part')):
+            try:
+                if part_path not in active_parts and now - os.path.getmtime(part_path) > CHUNKED_UPLOAD_TTL:
+                    os.remove(part_path)
+            except OSError:
+                continue
+    if expired:
+        logger.info(f"Expired {len(expired)} abandoned chunked uploads")
+
+def purge_chunked_uploads():
+    """Background loop expiring abandoned chunked uploads"""
+    while True:
+        time.sleep(min(CHUNKED_UPLOAD_TTL, 300))
+        try:
+            expire_chunked_uploads()
+        except Exception as e:
+            logger.error(f"Expiring chunked uploads failed: {str(e)}")
+
+@app.route('/mercedes/upload/<client_id>/initiate', methods=['POST'])
+@requires_auth
+def initiate_chunked_upload(client_id):
+    """Start a chunked upload and preallocate the destination file"""
+    try:
+        if request.auth_claims.get('client_id') != client_id:
+            return jsonify({'error': 'Client ID mismatch'}), 403
+
+        data = request.get_json(silent=True) or {}
+        filename = os.path.basename(data.get('filename') or 'uploaded_file')
+        try:
+            size = int(data['size'])
+            chunk_size = int(data['chunk_size'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'size and chunk_size are required'}), 400
+        if size < 0 or not 0 < chunk_size <= MAX_UPLOAD_CHUNK_SIZE:
+            return jsonify({'error': 'Invalid size or chunk_size'}), 400
+
+        upload_id = secrets.token_hex(16)
+        client_dir = os.path.join('client_files', client_id)
+        os.makedirs(client_dir, exist_ok=True)
+        part_path = os.path.join(client_dir, f'.{upload_id}.part')
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+
+        total_chunks = max(1, -(-size // chunk_size))
+        with chunked_uploads_lock:
+            chunked_uploads[upload_id] = {
+                'client_id': client_id,
+                'filename': filename,
+                'version': str(data.get('version', '1')),
+                'size': size,
+                'chunk_size': chunk_size,
+                'total_chunks': total_chunks,
+                'part_path': part_path,
+                'received': set(),
+                'hashed_chunks': 0,
+                'hasher': hashlib.sha3_256(),
+                'lock': threading.Lock(),
+                'last_activity': time.time(),
+                'completing': False,
+                'tx_hash': None
+            }
+
+        logger.info(f"Started chunked upload {upload_id} for {client_id}/{filename} ({size} bytes)")
+        return jsonify({'upload_id': upload_id, 'chunk_size': chunk_size, 'total_chunks': total_chunks}), 201
+
+    except Exception as e:
+        logger.error(f"Initiate upload failed: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/mercedes/upload/<client_id>/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@requires_auth
+def upload_chunk(client_id, upload_id, index):
+    """Write one chunk at its offset; resending a received chunk is a no-op"""
+    try:
+        if request.auth_claims.get('client_id') != client_id:
+            return jsonify({'error': 'Client ID mismatch'}), 403
+
+        upload = get_chunked_upload(client_id, upload_id)
+        if upload is None:
+            return jsonify({'error': 'Unknown upload'}), 404
+        if not 0 <= index < upload['total_chunks']:
+            return jsonify({'error': 'Chunk index out of range'}), 400
+
+        offset = index * upload['chunk_size']
+        expected_length = min(upload['chunk_size'], upload['size'] - offset)
+        chunk = request.get_data()
+        if len(chunk) != expected_length:
+            return jsonify({'error': f'Chunk {index} must be {expected_length} bytes'}), 400
+
+        upload['last_activity'] = time.time()
+        if index in upload['received']:
+            return jsonify({'index': index, 'status': 'duplicate'}), 200
+
+        with open(upload['part_path'], 'r+b') as f:
+            f.seek(offset)
+            f.write(chunk)
+
+        with upload['lock']:
+            if index not in upload['received']:
+                upload['received'].add(index)
+                advance_upload_hash(upload, index, chunk)
+
+        return jsonify({'index': index, 'status': 'stored'}), 200
+
+    except Exception as e:
+        logger.error(f"Chunk upload failed: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/mercedes/upload/<client_id>/<upload_id>/complete', methods=['POST'])
+@requires_auth
+def complete_chunked_upload(client_id, upload_id):
+    """Finalize a chunked upload and record its hash on-chain once.
+
+    The upload stays registered until its file is in place, so a /complete
+    that failed (for example on the chain transaction) can be retried.
+    """
+    try:
+        if request.auth_claims.get('client_id') != client_id:
+            return jsonify({'error': 'Client ID mismatch'}), 403
+
+        upload = get_chunked_upload(client_id, upload_id)
+        if upload is None:
+            return jsonify({'error': 'Unknown upload'}), 404
+
+        with upload['lock']:
+            missing = sorted(set(range(upload['total_chunks'])) - upload['received'])
+            if missing:
+                return jsonify({'error': 'Upload incomplete', 'missing_chunks': missing}), 409
+            file_hash = '0x' + upload['hasher'].hexdigest()
+
+        contract = load_contract()
+        if not contract:
+            return jsonify({'error': 'Contract not loaded'}), 500
+
+        # Claim the upload so a concurrent complete cannot register it twice
+        with chunked_uploads_lock:
+            if chunked_uploads.get(upload_id) is not upload:
+                return jsonify({'error': 'Unknown upload'}), 404
+            if upload['completing']:
+                return jsonify({'error': 'Upload is already being completed'}), 409
+            upload['completing'] = True
+
+        try:
+            # A retry after a failed rename must not register the hash a second time
+            if upload['tx_hash'] is None:
+                try:
+                    upload['tx_hash'] = store_file_hash(
+                        contract, request.headers.get('X-Client-Address'), upload['filename'], file_hash, upload['version']
+                    )
+                except Exception as e:
+                    logger.error(f"Blockchain store failed: {str(e)}")
+                    return jsonify({'error': 'Blockchain store failed'}), 500
+
+            file_path = os.path.join('client_files', client_id, upload['filename'])
+            os.replace(upload['part_path'], file_path)
+            with chunked_uploads_lock:
+                chunked_uploads.pop(upload_id, None)
+            tx_hash = upload['tx_hash']
+        finally:
+            upload['completing'] = False
+            upload['last_activity'] = time.time()
+
+        return jsonify({'status': 'success', 'file_hash': file_hash, 'tx': tx_hash.hex()}), 200
+
+    except Exception as e:
+        logger.error(f"Complete upload failed: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/mercedes/upload/<client_id>/<upload_id>', methods=['DELETE'])
+@requires_auth
+def abort_chunked_upload(client_id, upload_id):
+    """Discard a chunked upload and its partial file"""
+    if request.auth_claims.get('client_id') != client_id:
+        return jsonify({'error': 'Client ID mismatch'}), 403
+
+    upload = get_chunked_upload(client_id, upload_id)
+    if upload is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+
+    with chunked_uploads_lock:
+        if upload['completing']:
+            return jsonify({'error': 'Upload is being completed'}), 409
+        chunked_uploads.pop(upload_id, None)
+    if os.path.exists(upload['part_path']):
+        os.remove(upload['part_path'])
+    return jsonify({'status': 'aborted'}), 200
 
 @app.route('/mercedes/files/<client_id>/<filename>', methods=['GET'])
 def get_file(client_id, filename):
@@ -555,6 +817,8 @@ def get_file(client_id, filename):
 init_db()
 update_thread = threading.Thread(target=update_telemetry_data, daemon=True)
 update_thread.start()
+threading.Thread(target=purge_chunked_uploads, daemon=True).start()
+revocation_list.start()
 
 if __name__ == '__main__':
     # Verify contract is deployed before starting server
@@ -562,4 +826,6 @@ if __name__ == '__main__':
         logger.error("Cannot start server - contract not loaded!")
         exit(1)
     logger.info("Starting server with contract verification enabled")
+    # Serve HTTP/1.1 so pooled clients can keep connections alive
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(host='0.0.0.0', port=5002)
\ No newline at end of file
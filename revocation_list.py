@@ -0,0 +1,70 @@
+"""In-memory copy of the auth server's access-token deny-list.
+
+A background thread polls GET /revocations on the auth server with the last
+seen cursor, so each poll only transfers revocations added since the previous
+one. Token checks are then a set lookup in process memory, with no network
+hop per request. Entries are dropped once their token's exp has passed,
+because an expired token is rejected anyway.
+"""
+import logging
+import os
+import threading
+import time
+from http_transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+AUTH_SERVER_URL = os.getenv('AUTH_SERVER_URL', 'http://localhost:5001')
+REVOCATION_POLL_INTERVAL = float(os.getenv('REVOCATION_POLL_INTERVAL', '5'))
+
+class RevocationList:
+    def __init__(self, auth_server_url=AUTH_SERVER_URL, transport=None):
+        self.auth_server_url = auth_server_url.rstrip('/')
+        self.http = transport or get_transport()
+        self.cursor = 0
+        self.last_synced = None
+        self._revoked = {}  # jti -> exp
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def is_revoked(self, jti):
+        with self._lock:
+            return jti in self._revoked
+
+    def sync(self):
+        """Fetch revocations past the cursor and prune expired entries"""
+        has_more = True
+        while has_more:
+            response = self.http.get(
+                f"{self.auth_server_url}/revocations",
+                params={'since': self.cursor}
+            )
+            response.raise_for_status()
+            page = response.json()
+            with self._lock:
+                for entry in page['revocations']:
+                    self._revoked[entry['jti']] = entry['exp']
+                self.cursor = page['cursor']
+            has_more = page['has_more']
+
+        now = time.time()
+        with self._lock:
+            for jti in [jti for jti, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[jti]
+            self.last_synced = now
+            return len(self._revoked)
+
+    def start(self, interval=REVOCATION_POLL_INTERVAL):
+        """Poll the auth server every `interval` seconds in a daemon thread"""
+        def poll():
+            while True:
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.warning(f"Revocation sync failed: {str(e)}")
+                time.sleep(interval)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=poll, daemon=True)
+            self._thread.start()
+        return self
@@ -1,6 +1,9 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, Response, stream_with_context
 from flask_cors import CORS
 from combined_client import CombinedClient
+from nonce_manager import get_nonce_manager
+from http_transport import get_transport
+from jwks_cache import get_jwks_cache, hs256_secret
 import json
 from web3 import Web3
 import jwt
@@ -12,6 +15,10 @@ import uuid
 import traceback
 import random
 import string
+import time
+import queue
+import threading
+import hashlib
 import requests
 # Load environment variables
 load_dotenv()
@@ -25,6 +32,14 @@ CORS(app, origins=["http://localhost:3000", "http://localhost:5173"], supports_c
 # In-memory storage for session data (use Redis/database in production)
 sessions = {}
 
+# Per-session queues feeding the /api/session/<id>/events SSE streams
+session_subscribers = {}
+subscribers_lock = threading.Lock()
+SSE_HEARTBEAT_SECONDS = 15
+
+# Chunk size used when piping resource-server downloads through the gateway
+STREAM_CHUNK_SIZE = 64 * 1024
+
 def generate_auth_code():
     """Generate a random authorization code"""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
@@ -38,6 +53,21 @@ def update_session_data(session_id, data):
     if session_id not in sessions:
         sessions[session_id] = {}
     sessions[session_id].update(data)
+    
+    # Push step transitions and their results to SSE subscribers
+    if 'step' in data:
+        publish_session_event(session_id, 'step', {k: v for k, v in data.items() if k != 'last_activity'})
+
+def publish_session_event(session_id, event, data):
+    """Send an event to every SSE stream open on this session"""
+    with subscribers_lock:
+        subscribers = list(session_subscribers.get(session_id, ()))
+    for subscriber in subscribers:
+        subscriber.put((event, data))
+
+def format_sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 def create_client_instance(config):
     """Create a new CombinedClient instance from config"""
@@ -48,39 +78,56 @@ def create_client_instance(config):
         resource_server_url=config.get('resource_server')
     )
 
-def verify_token(token):
-    """Verify the JWT token"""
+def verify_token(token, auth_server_url=None):
+    """Verify the JWT token with the auth server's published key for its kid"""
     try:
-        # Use the same secret key as the auth server and resource server
-        secret_key = os.getenv('SECRET_KEY', 'your-secret-key')
-        
         # Extract token from Bearer format if present
         if token.startswith('Bearer '):
             token = token.split(' ')[1]
         
-        # Try different algorithms
-        algorithms = ['HS256', 'RS256']
-        for algorithm in algorithms:
-            try:
-                payload = jwt.decode(token, secret_key, algorithms=[algorithm])
-                
-                # Verify required claims
-                if not all(k in payload for k in ['client_id', 'vin', 'scope']):
-                    return False, "Token missing required claims"
-                    
-                return True, payload
-            except jwt.InvalidAlgorithmError:
-                continue
-            except Exception as e:
-                continue
-                
-        return False, "Could not verify token with any supported algorithm"
+        payload = get_jwks_cache(auth_server_url).decode(token, hs256_secret())
+        
+        # Verify required claims
+        if not all(k in payload for k in ['client_id', 'vin', 'scope']):
+            return False, "Token missing required claims"
+            
+        return True, payload
         
     except jwt.ExpiredSignatureError:
         return False, "Token has expired"
     except jwt.InvalidTokenError as e:
         return False, f"Invalid token: {str(e)}"
 
+def sign_blockchain_nonce(client, nonce):
+    """Sign the blockchain nonce and verify the signature recovers the client address"""
+    # Create message to sign
+    message = f"Nonce: {str(nonce)}"
+    message_bytes = message.encode('utf-8')
+    
+    # Sign the message
+    signed_message = client.w3.eth.account.sign_message(
+        encode_defunct(message_bytes),
+        private_key=client.private_key
+    )
+    
+    signature = signed_message.signature.hex()
+    
+    # Verify signature
+    recovered_address = client.w3.eth.account.recover_message(
+        encode_defunct(message_bytes),
+        signature=bytes.fromhex(signature)
+    )
+    
+    return signature, message, recovered_address.lower() == client.address.lower()
+
+def timed_step(timings, name, func, *args, **kwargs):
+    """Run one pipeline step and record its duration in milliseconds"""
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -140,6 +187,51 @@ def get_session(session_id):
 
 
 
+@app.route('/api/session/<session_id>/events', methods=['GET'])
+def session_events(session_id):
+    """Stream session step transitions as server-sent events.
+    
+    Sends a 'snapshot' of the current session first, then a 'step' event
+    carrying the changed fields whenever the session moves to a new step,
+    'reset' when it is reset and 'closed' when it is cleaned up. Unlike
+    /api/session/<id>, this does not touch last_activity.
+    """
+    if session_id not in sessions:
+        return jsonify({
+            "success": False,
+            "error": "Session not found"
+        }), 404
+    
+    def stream():
+        subscriber = queue.Queue()
+        with subscribers_lock:
+            session_subscribers.setdefault(session_id, []).append(subscriber)
+        try:
+            # Snapshot after subscribing so no transition falls in between
+            yield format_sse('snapshot', dict(get_session_data(session_id)))
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+                if event == 'closed':
+                    break
+        finally:
+            with subscribers_lock:
+                remaining = session_subscribers.get(session_id, [])
+                if subscriber in remaining:
+                    remaining.remove(subscriber)
+                if not remaining:
+                    session_subscribers.pop(session_id, None)
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/auth/configure', methods=['POST'])
 def configure_client():
     """Configure OAuth client and request authorization code from auth server"""
@@ -187,7 +279,7 @@ def configure_client():
             
             app.logger.info(f"Requesting auth code from {auth_url} with payload: {auth_payload}")
             
-            response = requests.post(auth_url, json=auth_payload, timeout=10)
+            response = get_transport().post(auth_url, json=auth_payload, timeout=10)
             
             if response.status_code == 200:
                 auth_response = response.json()
@@ -468,7 +560,8 @@ def validate_token():
             token = f'Bearer {token}'
         
         # Verify token
-        is_valid, message = verify_token(token)
+        auth_server = session_data.get('client_config', {}).get('auth_server')
+        is_valid, message = verify_token(token, auth_server)
         
         if is_valid:
             update_session_data(session_id, {
@@ -523,8 +616,8 @@ def request_nonce():
         config = session_data.get('client_config', {})
         client = create_client_instance(config)
         
-        # Get nonce
-        nonce = client.w3.eth.get_transaction_count(client.address)
+        # Served from the local count, read from the node on first use
+        nonce = get_nonce_manager(client.w3).current(client.address)
         
         update_session_data(session_id, {
             'nonce': nonce,
@@ -581,25 +674,7 @@ def sign_nonce():
         config = session_data.get('client_config', {})
         client = create_client_instance(config)
         
-        # Create message to sign
-        message = f"Nonce: {str(nonce)}"
-        message_bytes = message.encode('utf-8')
-        
-        # Sign the message
-        signed_message = client.w3.eth.account.sign_message(
-            encode_defunct(message_bytes),
-            private_key=client.private_key
-        )
-        
-        signature = signed_message.signature.hex()
-        
-        # Verify signature
-        recovered_address = client.w3.eth.account.recover_message(
-            encode_defunct(message_bytes),
-            signature=bytes.fromhex(signature)
-        )
-        
-        signature_valid = recovered_address.lower() == client.address.lower()
+        signature, message, signature_valid = sign_blockchain_nonce(client, nonce)
         
         if signature_valid:
             update_session_data(session_id, {
@@ -782,6 +857,218 @@ def download_file():
             "error": str(e)
         }), 500
 
+@app.route('/api/resource/download/stream', methods=['GET', 'POST'])
+def stream_download():
+    """Pipe a verified file from the resource server straight to the caller.
+    
+    Takes session_id, filename and version as query parameters (GET, so the
+    browser can follow a link) or as a JSON body (POST). The file is never
+    written to the gateway's disk: chunks are hashed as they pass through,
+    and X-File-Hash carries the hash the resource server verified on-chain.
+    """
+    try:
+        data = request.get_json(silent=True) if request.method == 'POST' else request.args
+        data = data or {}
+        session_id = data.get('session_id')
+        filename = data.get('filename', 'latest_update')
+        version = data.get('version', '1')
+        
+        if not session_id:
+            return jsonify({
+                "success": False,
+                "error": "Session ID required"
+            }), 400
+        
+        session_data = get_session_data(session_id)
+        if not session_data:
+            return jsonify({
+                "success": False,
+                "error": "Session not found"
+            }), 404
+        
+        token = session_data.get('validated_token')
+        if not token:
+            return jsonify({
+                "success": False,
+                "error": "No validated token found"
+            }), 400
+        
+        # Create client instance
+        config = session_data.get('client_config', {})
+        client = create_client_instance(config)
+        client.token = token
+        
+        upstream = client.open_file_stream(filename, version)
+        if upstream is None:
+            return jsonify({
+                "success": False,
+                "error": "Download failed"
+            }), 400
+        
+        server_hash = upstream.headers.get('X-File-Hash')
+        if not server_hash:
+            # Without the resource server's hash the stream cannot be verified
+            upstream.close()
+            return jsonify({
+                "success": False,
+                "error": "Resource server did not send a file hash"
+            }), 502
+        
+        def generate():
+            sha3_hash = hashlib.sha3_256()
+            # The last chunk is held back until the hash matches, so a mismatch
+            # leaves the caller short of Content-Length instead of with a full body
+            held = b''
+            with upstream:
+                for chunk in upstream.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if chunk:
+                        sha3_hash.update(chunk)
+                        if held:
+                            yield held
+                        held = chunk
+            
+            calculated_hash = '0x' + sha3_hash.hexdigest()
+            if calculated_hash != server_hash:
+                app.logger.error(f"Session {session_id} streamed file hash mismatch: {calculated_hash} != {server_hash}")
+                raise IOError("File hash mismatch")
+            if held:
+                yield held
+            
+            update_session_data(session_id, {
+                'streamed_file': filename,
+                'streamed_file_hash': calculated_hash,
+                'step': 4,
+                'last_activity': datetime.now().isoformat()
+            })
+            app.logger.info(f"Session {session_id} file streamed: {filename}")
+        
+        headers = {
+            'Content-Disposition': upstream.headers.get('Content-Disposition', f'attachment; filename={filename}'),
+            'X-File-Hash': server_hash,
+            'X-File-Version': upstream.headers.get('X-File-Version', str(version)),
+            'Access-Control-Expose-Headers': 'X-File-Hash, X-File-Version, Content-Disposition'
+        }
+        if 'Content-Length' in upstream.headers:
+            headers['Content-Length'] = upstream.headers['Content-Length']
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype=upstream.headers.get('Content-Type', 'application/octet-stream'),
+            headers=headers
+        )
+        
+    except Exception as e:
+        app.logger.error(f"Error streaming file: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/flow/run', methods=['POST'])
+def run_flow():
+    """Run the whole wizard pipeline server-side in a single request.
+    
+    Accepts the same configuration as /api/auth/configure plus the resource
+    parameters (scope, filename, version). Intermediate results stay in local
+    variables instead of the sessions dict. The validate-code step is skipped
+    because the code never leaves the server.
+    """
+    timings = {}
+    flow_start = time.perf_counter()
+    
+    def flow_failed(step, error, status=400):
+        timings['total'] = round((time.perf_counter() - flow_start) * 1000, 2)
+        return jsonify({
+            "success": False,
+            "failed_step": step,
+            "error": error,
+            "timings_ms": timings
+        }), status
+    
+    try:
+        data = request.json or {}
+        
+        client_id = data.get('client_id', 'tesla_models_3')
+        mode = data.get('mode', '1')  # "1" for telemetry, "2" for file download
+        scopes = data.get('scopes', ['engine_start', 'door_unlock'])
+        if mode == "2":  # File download mode
+            scopes = ["file_download"]
+        
+        client = CombinedClient(
+            client_id=client_id,
+            client_secret=data.get('client_secret', 'tesla_secret_3'),
+            auth_server_url=data.get('auth_server', 'http://localhost:5001'),
+            resource_server_url=data.get('resource_server', 'http://localhost:5002')
+        )
+        
+        # Step 1: Authorization code
+        auth_code = timed_step(timings, 'authorize', client.authorize, " ".join(scopes))
+        if not auth_code:
+            return flow_failed('authorize', "No authorization code received from auth server")
+        
+        # Step 2: Token exchange
+        token = timed_step(timings, 'token_generate', client.get_token, auth_code)
+        if not token:
+            return flow_failed('token_generate', "Token generation failed - no token received")
+        
+        # Step 3: Token validation
+        is_valid, token_details = timed_step(timings, 'token_validate', verify_token, f'Bearer {token}', client.auth_server_url)
+        if not is_valid:
+            return flow_failed('token_validate', f"Token validation failed: {token_details}")
+        client.token = token
+        
+        # Step 4: Blockchain nonce
+        nonce = timed_step(timings, 'nonce_request', get_nonce_manager(client.w3).current, client.address)
+        
+        # Step 5: Sign nonce
+        signature, message, signature_valid = timed_step(timings, 'nonce_sign', sign_blockchain_nonce, client, nonce)
+        if not signature_valid:
+            return flow_failed('nonce_sign', "Signature verification failed")
+        
+        result = {
+            "token": token,
+            "token_details": token_details,
+            "nonce": nonce,
+            "address": client.address,
+            "signature": signature,
+            "signed_message": message
+        }
+        
+        # Step 6: Resource access
+        if mode == "2":
+            filename = data.get('filename', 'latest_update')
+            os.makedirs('downloads', exist_ok=True)
+            save_path = f"downloads/{client.client_id}_{filename}.txt"
+            success = timed_step(
+                timings, 'resource_download', client.download_file,
+                filename=filename,
+                version=data.get('version', '1'),
+                save_path=save_path
+            )
+            if not success:
+                return flow_failed('resource_download', "Download failed")
+            result['file_path'] = save_path
+        else:
+            response = timed_step(timings, 'resource_telemetry', client.get_data, data.get('scope', 'engine_start'))
+            if not response:
+                return flow_failed('resource_telemetry', "No data received from server")
+            result['data'] = response
+        
+        timings['total'] = round((time.perf_counter() - flow_start) * 1000, 2)
+        app.logger.info(f"Flow for {client_id} completed in {timings['total']} ms")
+        
+        return jsonify({
+            "success": True,
+            "step": 4,
+            "result": result,
+            "timings_ms": timings,
+            "message": "Flow completed successfully"
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Error running flow: {str(e)}")
+        return flow_failed(next(reversed(timings), None), str(e), 500)
+
 @app.route('/api/session/<session_id>/reset', methods=['POST'])
 def reset_session(session_id):  # Add session_id parameter
     """Reset session to start over"""
@@ -792,6 +1079,7 @@ def reset_session(session_id):  # Add session_id parameter
                 'created_at': datetime.now().isoformat(),
                 'last_activity': datetime.now().isoformat()
             }
+            publish_session_event(session_id, 'reset', dict(sessions[session_id]))
             
             app.logger.info(f"Session {session_id} reset")
         
@@ -822,6 +1110,7 @@ def cleanup_sessions():
         
         for session_id in expired_sessions:
             del sessions[session_id]
+            publish_session_event(session_id, 'closed', {'reason': 'expired'})
             app.logger.info(f"Cleaned up expired session: {session_id}")
         
         return jsonify({
@@ -0,0 +1,66 @@
+"""Nonce signing for the vehicle clients and fleet gateways.
+
+Parsed key objects are cached per private key, so the hex key is not
+re-parsed on every signature. SigningService.sign_batch spreads large batches
+across a process pool, and each worker process keeps its own key cache.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import keccak
+
+KEY_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def load_signer(private_key):
+    """Parse a private key once and keep the resulting account object"""
+    return Account.from_key(private_key)
+
+def sign_nonce(private_key, nonce):
+    """Sign a resource-server nonce the way NonceValidator expects.
+
+    keccak(text=nonce) is the same digest as w3.solidity_keccak(['string'], [nonce]).
+    """
+    signable = encode_defunct(primitive=keccak(text=nonce))
+    return load_signer(private_key).sign_message(signable).signature.hex()
+
+def _sign_chunk(items):
+    return [sign_nonce(private_key, nonce) for private_key, nonce in items]
+
+class SigningService:
+    def __init__(self, workers=None, chunk_size=256):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def sign(self, private_key, nonce):
+        """Sign a single nonce in this process"""
+        return sign_nonce(private_key, nonce)
+
+    def sign_batch(self, items):
+        """Sign a list of (private_key, nonce) pairs, returning signatures in order"""
+        items = list(items)
+        if len(items) <= self.chunk_size or self.workers == 1:
+            return _sign_chunk(items)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        signatures = []
+        for chunk_signatures in self._pool.map(_sign_chunk, chunks):
+            signatures.extend(chunk_signatures)
+        return signatures
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
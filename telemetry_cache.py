@@ -0,0 +1,84 @@
+"""Client-side cache for resource-server telemetry.
+
+The resource server refreshes telemetry once a minute and sends an ETag along
+with a Cache-Control max-age that runs until the next refresh. Entries are
+keyed by (client_id, endpoint). A fresh entry is returned without any network
+call. A stale entry is revalidated with If-None-Match, and a 304 reply renews
+it without re-downloading the body.
+"""
+import re
+import threading
+import time
+
+DEFAULT_TTL = 60
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+def parse_max_age(cache_control, default=DEFAULT_TTL):
+    """Read max-age from a Cache-Control header, falling back to default"""
+    match = MAX_AGE_PATTERN.search(cache_control or '')
+    return int(match.group(1)) if match else default
+
+class TelemetryCache:
+    def __init__(self, default_ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def get_fresh(self, key):
+        """Return cached data if it is still within its TTL, counting a hit"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['expires_at'] > self.clock():
+                self.hits += 1
+                return entry['data']
+            return None
+
+    def etag(self, key):
+        """ETag of the stored entry (fresh or stale), for If-None-Match"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['etag'] if entry else None
+
+    def store(self, key, data, etag=None, max_age=None):
+        """Store a full 200 response, counting a miss"""
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = {
+                'data': data,
+                'etag': etag,
+                'expires_at': self.clock() + (self.default_ttl if max_age is None else max_age)
+            }
+
+    def revalidate(self, key, max_age=None):
+        """Renew a stale entry after a 304 and return its data"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self.revalidations += 1
+            entry['expires_at'] = self.clock() + (self.default_ttl if max_age is None else max_age)
+            return entry['data']
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.revalidations + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'served_without_body_rate': round((self.hits + self.revalidations) / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,221 @@
+"""Buffered raw-telemetry uploader with an on-disk spool.
+
+Records are appended to a spool file as soon as they are logged, so nothing is
+lost while the auth server is unreachable or the process restarts. A
+background thread seals the spool into a batch once it reaches a size or
+record threshold, or when the oldest record has waited flush_interval seconds.
+Pending batches are streamed gzip-compressed to /telemetry/ingest, as many
+per request as fit in max_request_bytes, so a car that was offline for
+hours catches up in a few requests. Each batch is preceded by a
+{"_batch": <id>} line, so the server skips batches it already stored when a
+request is retried. Failed requests are retried with jittered exponential
+backoff; a buffer that fills up meanwhile is sealed but waits for the retry.
+
+Usage:
+    uploader = TelemetryUploader(client)   # an authorized CombinedClient
+    uploader.start()
+    uploader.log("speed=42 battery=81")
+    ...
+    uploader.close()
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+CURRENT_SPOOL = 'current.ndjson'
+BATCH_PREFIX = 'batch-'
+READ_CHUNK_SIZE = 64 * 1024
+
+class TelemetryUploader:
+    def __init__(self, client, spool_dir=None, max_batch_records=500, max_batch_bytes=256 * 1024,
+                 flush_interval=5.0, max_backoff=60.0, max_request_bytes=64 * 1024 * 1024):
+        self.client = client
+        self.spool_dir = spool_dir or os.path.join('telemetry_spool', client.client_id)
+        self.max_batch_records = max_batch_records
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_request_bytes = max_request_bytes
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.current_path = os.path.join(self.spool_dir, CURRENT_SPOOL)
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Records left over from a previous run are picked up where they were
+        self._current = open(self.current_path, 'a', encoding='utf-8')
+        with open(self.current_path, 'r', encoding='utf-8') as f:
+            self._records = sum(1 for _ in f)
+        self._bytes = os.path.getsize(self.current_path)
+        self._first_record_at = time.monotonic() if self._records else None
+
+        self.stats = {'records_logged': 0, 'batches_sent': 0, 'records_sent': 0, 'records_rejected': 0,
+                      'records_duplicate': 0, 'send_failures': 0}
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def log(self, text):
+        """Append one telemetry record to the spool"""
+        line = json.dumps({'text': text, 'recorded_at': datetime.utcnow().isoformat()}) + '\n'
+        with self._lock:
+            self._current.write(line)
+            self._current.flush()
+            self._records += 1
+            self._bytes += len(line.encode('utf-8'))
+            self.stats['records_logged'] += 1
+            if self._first_record_at is None:
+                self._first_record_at = time.monotonic()
+            full = self._records >= self.max_batch_records or self._bytes >= self.max_batch_bytes
+        if full:
+            self._wake.set()
+
+    def _batch_due(self):
+        with self._lock:
+            if self._records >= self.max_batch_records or self._bytes >= self.max_batch_bytes:
+                return True
+            return self._first_record_at is not None and \
+                time.monotonic() - self._first_record_at >= self.flush_interval
+
+    def _seal(self):
+        """Turn the current spool file into an immutable batch file"""
+        with self._lock:
+            if self._records == 0:
+                return
+            self._current.close()
+            batch_name = f"{BATCH_PREFIX}{time.time_ns()}-{uuid.uuid4().hex[:8]}.ndjson"
+            os.replace(self.current_path, os.path.join(self.spool_dir, batch_name))
+            self._current = open(self.current_path, 'a', encoding='utf-8')
+            self._records = 0
+            self._bytes = 0
+            self._first_record_at = None
+
+    def pending_batches(self):
+        """Sealed batches waiting to be sent, oldest first"""
+        return sorted(
+            os.path.join(self.spool_dir, name)
+            for name in os.listdir(self.spool_dir)
+            if name.startswith(BATCH_PREFIX)
+        )
+
+    def _request_body(self, paths):
+        """Gzip the batches, each after its batch marker, without reading them into memory at once"""
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        for path in paths:
+            batch_id = os.path.basename(path)[len(BATCH_PREFIX):].rsplit('.', 1)[0]
+            yield compressor.compress(json.dumps({'_batch': batch_id}).encode('utf-8') + b'\n')
+            with open(path, 'rb') as f:
+                for data in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                    yield compressor.compress(data)
+        yield compressor.flush()
+
+    def _send(self, paths):
+        try:
+            response = self.client.http.post(
+                f"{self.client.auth_server_url}/telemetry/ingest",
+                params={'car_id': self.client.client_id},
+                headers={
+                    'Authorization': f'Bearer {self.client.current_token()}',
+                    'Content-Type': 'application/x-ndjson',
+                    'Content-Encoding': 'gzip'
+                },
+                data=self._request_body(paths)
+            )
+        except Exception as e:
+            print(f"Telemetry upload error: {str(e)}")
+            return False
+
+        if response.status_code != 200:
+            print(f"Telemetry upload failed ({response.status_code}): {response.text}")
+            return False
+
+        report = response.json()
+        for path in paths:
+            os.remove(path)
+        self.stats['batches_sent'] += len(paths)
+        self.stats['records_sent'] += report['accepted']
+        self.stats['records_duplicate'] += report['duplicates']
+        self.stats['records_rejected'] += report['rejected']
+        if report['rejected']:
+            print(f"Telemetry upload: server rejected {report['rejected']} records: {report['errors']}")
+        return True
+
+    def _request_groups(self, paths):
+        """Split pending batches into requests of at most max_request_bytes (at least one batch each)"""
+        group, size = [], 0
+        for path in paths:
+            batch_size = os.path.getsize(path)
+            if group and size + batch_size > self.max_request_bytes:
+                yield group
+                group, size = [], 0
+            group.append(path)
+            size += batch_size
+        if group:
+            yield group
+
+    def flush(self):
+        """Seal the spool and send every pending batch; False if one is still unsent"""
+        self._seal()
+        with self._send_lock:
+            for paths in self._request_groups(self.pending_batches()):
+                if not self._send(paths):
+                    self.stats['send_failures'] += 1
+                    return False
+        return True
+
+    def _run(self):
+        backoff = 0.0
+        retry_at = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            self._wake.wait(retry_at - now if retry_at > now else self.flush_interval / 4)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if time.monotonic() < retry_at:
+                # Woken by a full buffer while backing off: seal it, but keep waiting to send
+                if self._batch_due():
+                    self._seal()
+                continue
+            if not (self._batch_due() or self.pending_batches()):
+                continue
+
+            if self.flush():
+                backoff = 0.0
+                retry_at = 0.0
+            else:
+                # Jittered backoff keeps a fleet of cars from retrying in lockstep
+                ceiling = min(self.max_backoff, max(1.0, backoff * 2))
+                backoff = random.uniform(ceiling / 2, ceiling)
+                retry_at = time.monotonic() + backoff
+
+    def close(self, flush=True):
+        """Stop the background thread, optionally sending what is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.flush()
+        with self._lock:
+            self._current.close()
@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import io
+import httpx
+import pytest
+import requests
+import async_server
+import server
+
+CONTENT = b'x' * (200 * 1024 + 17)
+CONTENT_HASH = '0x' + hashlib.sha3_256(CONTENT).hexdigest()
+SESSION_ID = 'STREAM01'
+URL = f'/api/resource/download/stream?session_id={SESSION_ID}&filename=update.bin'
+
+def upstream_headers(file_hash):
+    headers = {'Content-Length': str(len(CONTENT))}
+    if file_hash is not None:
+        headers['X-File-Hash'] = file_hash
+    return headers
+
+class FlaskUpstreamClient:
+    def __init__(self, file_hash):
+        self.file_hash = file_hash
+
+    def open_file_stream(self, filename, version):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(CONTENT)
+        response.headers.update(upstream_headers(self.file_hash))
+        return response
+
+class AsyncUpstreamClient(FlaskUpstreamClient):
+    async def open_file_stream(self, filename, version):
+        return httpx.Response(200, headers=upstream_headers(self.file_hash), stream=httpx.ByteStream(CONTENT))
+
+def flask_get(monkeypatch, file_hash):
+    """GET the Flask stream route; returns (status, received bytes, whether the stream was aborted)"""
+    monkeypatch.setattr(server, 'create_client_instance', lambda config: FlaskUpstreamClient(file_hash))
+    monkeypatch.setitem(server.sessions, SESSION_ID, {'validated_token': 'token', 'client_config': {}})
+    response = server.app.test_client().get(URL, buffered=False)
+    received = b''
+    try:
+        for chunk in response.response:
+            received += chunk
+    except IOError:
+        return response.status_code, received, True
+    return response.status_code, received, False
+
+def quart_get(monkeypatch, file_hash):
+    """GET the Quart stream route; returns (status, received bytes, whether the stream was aborted)"""
+    monkeypatch.setattr(async_server, 'create_client_instance', lambda config: AsyncUpstreamClient(file_hash))
+    monkeypatch.setitem(async_server.sessions, SESSION_ID, {'validated_token': 'token', 'client_config': {}})
+
+    async def get():
+        async with async_server.app.test_request_context(URL):
+            response = await async_server.app.make_response(await async_server.stream_download())
+            received = b''
+            try:
+                async with response.response as body:
+                    async for chunk in body:
+                        received += chunk
+            except IOError:
+                return response.status_code, received, True
+            return response.status_code, received, False
+
+    return asyncio.run(get())
+
+@pytest.mark.parametrize('get', [flask_get, quart_get])
+def test_matching_hash_streams_whole_file(monkeypatch, get):
+    assert get(monkeypatch, CONTENT_HASH) == (200, CONTENT, False)
+
+@pytest.mark.parametrize('get', [flask_get, quart_get])
+def test_mismatched_hash_never_delivers_whole_file(monkeypatch, get):
+    status, received, aborted = get(monkeypatch, '0x' + '0' * 64)
+    assert status == 200 and aborted
+    assert len(received) < len(CONTENT)
+
+@pytest.mark.parametrize('get', [flask_get, quart_get])
+def test_missing_hash_is_refused(monkeypatch, get):
+    status, _, _ = get(monkeypatch, None)
+    assert status == 502
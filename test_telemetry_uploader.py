@@ -0,0 +1,37 @@
+import time
+from telemetry_uploader import TelemetryUploader
+
+class FailingIngest:
+    """Stands in for the HTTP transport while /telemetry/ingest is down"""
+    def __init__(self):
+        self.attempts = []
+
+    def post(self, url, **kwargs):
+        self.attempts.append(time.monotonic())
+        raise ConnectionError('ingest endpoint unreachable')
+
+class FakeClient:
+    client_id = 'test_car_1'
+    auth_server_url = 'http://localhost:5001'
+
+    def __init__(self):
+        self.http = FailingIngest()
+
+    def current_token(self):
+        return 'token'
+
+def test_full_buffers_do_not_cut_backoff_short(tmp_path):
+    client = FakeClient()
+    uploader = TelemetryUploader(client, spool_dir=str(tmp_path), max_batch_records=1, flush_interval=0.2).start()
+    deadline = time.monotonic() + 1.5
+    while time.monotonic() < deadline:
+        uploader.log('speed=42')  # Every record fills the buffer
+        time.sleep(0.005)
+    uploader.close(flush=False)
+
+    # Backoff starts at 0.5-1s and doubles, so at most the first try and two retries fit
+    assert 1 <= len(client.http.attempts) <= 3
+    gaps = [later - earlier for earlier, later in zip(client.http.attempts, client.http.attempts[1:])]
+    assert all(gap >= 0.5 for gap in gaps)
+    # Records logged while backing off are still sealed into batches
+    assert len(uploader.pending_batches()) > 1
@@ -0,0 +1,143 @@
+"""Access-token cache with proactive refresh for long-running vehicle clients.
+
+Tokens are cached per (client_id, scope) together with their expiry from the
+token response's expires_in. A background timer fetches a new token
+refresh_margin seconds before a token expires, so callers keep getting a
+valid token without waiting. Clients that support the client_credentials
+grant get it in one request instead of the authorize/token pair. A token a
+client obtained itself, e.g. through the authorization-code flow, is handed
+over with remember() and refreshed the same way. Each key has
+its own lock, so only one exchange per key is ever in flight: concurrent
+callers that find no usable token wait for that single exchange instead of
+starting their own.
+"""
+import threading
+import time
+
+DEFAULT_EXPIRES_IN = 3600
+REFRESH_MARGIN = 300
+RETRY_DELAY = 30
+
+def normalize_scope(scope):
+    return ' '.join(sorted(scope.split()))
+
+class TokenManager:
+    def __init__(self, refresh_margin=REFRESH_MARGIN, clock=time.time):
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self._entries = {}
+        self._key_locks = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'exchanges': 0, 'background_refreshes': 0, 'failures': 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _margin(self, expires_in):
+        # Short-lived tokens are refreshed halfway through instead
+        return min(self.refresh_margin, expires_in / 2)
+
+    def _usable(self, entry):
+        return entry is not None and entry['expires_at'] > self.clock()
+
+    def _exchange(self, client, key):
+        """Fetch a fresh token for one key; the caller holds the key lock"""
+        _, scope = key
+        self.stats['exchanges'] += 1
+        if hasattr(client, 'get_client_credentials_token'):
+            token = client.get_client_credentials_token(scope)
+        else:
+            auth_code = client.authorize(scope)
+            token = client.get_token(auth_code) if auth_code else None
+        if not token:
+            self.stats['failures'] += 1
+            return None
+        return self.remember(client, scope, token, getattr(client, 'token_expires_in', None))
+
+    def remember(self, client, scope, token, expires_in=None):
+        """Cache a token the client obtained and schedule its refresh; returns its entry"""
+        key = (client.client_id, normalize_scope(scope))
+        expires_in = expires_in or DEFAULT_EXPIRES_IN
+        with self._lock:
+            entry = self._entries.get(key)
+            # The client may already have handed this token over during our exchange
+            if entry is not None and entry['token'] == token:
+                return entry
+            entry = {'token': token, 'expires_at': self.clock() + expires_in}
+            self._entries[key] = entry
+        self._schedule(client, key, expires_in - self._margin(expires_in))
+        return entry
+
+    def _schedule(self, client, key, delay):
+        timer = threading.Timer(max(0, delay), self._background_refresh, args=(client, key))
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._timers[key] = timer
+        timer.start()
+
+    def _background_refresh(self, client, key):
+        lock = self._key_lock(key)
+        # A caller already exchanging for this key makes this refresh redundant
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            self.stats['background_refreshes'] += 1
+            if self._exchange(client, key) is None:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if self._usable(entry):
+                    self._schedule(client, key, min(RETRY_DELAY, entry['expires_at'] - self.clock()))
+        finally:
+            lock.release()
+
+    def get_token(self, client, scope):
+        """Return a valid access token for client and scope, exchanging only if none is usable"""
+        key = (client.client_id, normalize_scope(scope))
+        with self._lock:
+            entry = self._entries.get(key)
+        if self._usable(entry):
+            self.stats['hits'] += 1
+            return entry['token']
+
+        with self._key_lock(key):
+            # Another caller may have finished the exchange while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+            if self._usable(entry):
+                self.stats['hits'] += 1
+                return entry['token']
+
+            entry = self._exchange(client, key)
+            return entry['token'] if entry else None
+
+    def invalidate(self, client_id, scope):
+        """Forget a token the server rejected so the next call exchanges again"""
+        key = (client_id, normalize_scope(scope))
+        with self._lock:
+            self._entries.pop(key, None)
+            timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def close(self):
+        with self._lock:
+            timers = list(self._timers.values())
+            self._timers.clear()
+        for timer in timers:
+            timer.cancel()
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+def get_token_manager():
+    """Return the process-wide token manager shared by all clients"""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = TokenManager()
+        return _default_manager